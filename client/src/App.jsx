@@ -23,6 +23,15 @@ import Toaster from 'react-hot-toast'
 
 const COOLDOWN_KEY = 'cooldownEndTime';
 const RESULTS_KEY = 'auctionResults';
+const JOB_POLL_INTERVAL_MS = 3000;
+const JOB_FINISHED_STATES = ['completed', 'failed', 'cancelled'];
+// Fields the table and filters use; the server leaves out the rest
+const RESULT_FIELDS = [
+  'ai_labels', 'simple_tag', 'code', 'part_number', 'date', 'post_date', 'price',
+  'auction_object', 'kind', 'property_type', 'address', 'property_area', 'price_per_sqm',
+  'occupancy_status', 'property_description', 'notes', 'all_pdf_links', 'detail_link',
+  'region', 'municipality',
+].join(',');
 
 function App() {
   const { t } = useTranslation();
@@ -160,76 +169,66 @@ function App() {
     setLastScrapeParams(params);
     setScrapingProgress("");
 
-    let allResults = [];
-    let totalAuctions = 0;
+    const pageLabel = start === end ? `page ${start}` : `pages ${start} to ${end}`;
+    setScrapingProgress(`Scraping ${pageLabel}...`);
 
-    for (let currentPage = start; currentPage <= end; currentPage++) {
-      let progressMsg = '';
-      if (start === end) {
-        progressMsg = `Scraping page ${currentPage}...`;
+    // The server walks the whole page range in one browser session
+    const requestData = {
+      ...params,
+      page: start,
+      endPage: end,
+    };
+
+    try {
+      // Submit the range as a background job, then poll it for results
+      const submitResponse = await fetch(`${import.meta.env.VITE_SERVER_URL}/jobs`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(requestData),
+      });
+      const job = await submitResponse.json();
+
+      if (!submitResponse.ok) {
+        const errorMessage = job.error || job.message || 'Unknown error occurred';
+        setError(`Error on ${pageLabel}: ${errorMessage}`);
       } else {
-        progressMsg = `Scraping page ${currentPage} of ${end}...`;
-      }
-      setScrapingProgress(progressMsg);
-
-      const requestData = {
-        ...params,
-        page: currentPage,
-      };
-
-      try {
-        const response = await fetch(`${import.meta.env.VITE_SERVER_URL}/scrape`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify(requestData),
-        });
-
-        const data = await response.json();
-        console.log(`Page ${currentPage} response:`, data); // Debug log
-
-        if (!response.ok) {
-          const errorMessage = data.error || data.message || 'Unknown error occurred';
-          setError(`Error on page ${currentPage}: ${errorMessage}`);
-          break; // Stop on error
+        let offset = 0;
+        let streamedResults = [];
+        let data = job;
+        while (!JOB_FINISHED_STATES.includes(data.status)) {
+          await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+          const pollResponse = await fetch(
+            `${import.meta.env.VITE_SERVER_URL}/jobs/${job.job_id}/results?offset=${offset}&fields=${RESULT_FIELDS}`
+          );
+          data = await pollResponse.json();
+          if (!pollResponse.ok) {
+            throw new Error(data.error || 'Could not read job status');
+          }
+          offset = data.next_offset;
+          streamedResults = [...streamedResults, ...data.results];
+          setResults({
+            results: streamedResults,
+            total_results: data.total_results || streamedResults.length,
+          });
         }
 
-        if (data.error) {
-          setError(`Error on page ${currentPage}: ${data.error}`);
-          break; // Stop on error
+        if (data.status !== 'completed') {
+          setError(`Error on ${pageLabel}: ${data.error || `job ${data.status}`}`);
         }
 
-        if (data.results && Array.isArray(data.results)) {
-          allResults = [...allResults, ...data.results];
-          totalAuctions = data.total_results || allResults.length;
-          setResults({ results: allResults, total_results: totalAuctions });
-        } else {
-          // Handle case where data.results is not as expected
-          console.warn(`Unexpected data format on page ${currentPage}:`, data);
-          if (Array.isArray(data)) {
-            allResults = [...allResults, ...data];
-          } else {
-            console.error(`Invalid data format on page ${currentPage}:`, data);
-          }
-          totalAuctions = allResults.length;
-          setResults({ results: allResults, total_results: totalAuctions });
-        }
+        // Replace the streamed results with the crawl in listing order
+        const finalResponse = await fetch(`${import.meta.env.VITE_SERVER_URL}/jobs/${job.job_id}/results?fields=${RESULT_FIELDS}`);
+        data = await finalResponse.json();
+        console.log(`Response for ${pageLabel}:`, data); // Debug log
 
-      } catch (err) {
-        console.error(`Network error on page ${currentPage}:`, err);
-        if (err.name === 'TypeError' && err.message.includes('fetch')) {
-          setError(`Failed to connect to server. Please check if the server is running at ${import.meta.env.VITE_SERVER_URL}`);
-        } else {
-          setError(`Failed to scrape page ${currentPage}: ${err.message}`);
-        }
-        break; // Stop on error
+        setResults({ results: data.results, total_results: data.total_results || data.results.length });
       }
-
-      // Add delay between pages to avoid captcha (6-8 minutes)
-      if (currentPage < end) {
-        const delayMinutes = Math.floor(Math.random() * 3) + 6; // Random 6-8 minutes
-        const delayMs = delayMinutes * 60 * 1000;
-        setScrapingProgress(`Waiting ${delayMinutes} minutes before next page to avoid captcha...`);
-        await new Promise(resolve => setTimeout(resolve, delayMs));
+    } catch (err) {
+      console.error(`Network error on ${pageLabel}:`, err);
+      if (err.name === 'TypeError' && err.message.includes('fetch')) {
+        setError(`Failed to connect to server. Please check if the server is running at ${import.meta.env.VITE_SERVER_URL}`);
+      } else {
+        setError(`Failed to scrape ${pageLabel}: ${err.message}`);
       }
     }
 
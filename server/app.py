@@ -1,12 +1,33 @@
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, Response, render_template_string, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from scraper import scrape_auctions, send_telegram_notification
+from scraper import scrape_auctions, iter_auctions, send_telegram_notification, build_scrape_summary_message
+from browser_pool import start_browser_pool
+from jobs import job_manager
+from gemini_pool import gemini_executor
+from rate_control import rate_controller
+from results_store import InvalidQuery, get_results_store, parse_query_date
+from labeling import LABEL_THRESHOLDS, preview_counts, relabel_results, thresholds_with
+from records import AuctionRecord, json_default
+from responses import json_response, requested_fields, requested_layout, shape_results
 import os
+import json
 from dotenv import dotenv_values
 
 config = dotenv_values()  # Load .env file into a dictionary
 
+class RecordJSONProvider(DefaultJSONProvider):
+    """jsonify() that writes AuctionRecords in their result_item shape"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, AuctionRecord):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+
 app = Flask(__name__)
+app.json = RecordJSONProvider(app)
 CORS(app)
 
 DASHBOARD_HTML = '''
@@ -66,16 +87,8 @@ DASHBOARD_HTML = '''
 def dashboard():
     return render_template_string(DASHBOARD_HTML)
 
-@app.route("/scrape", methods=["POST"])
-def scrape():
-    # Get filter parameters from request
-    data = request.get_json()  # Use get_json() instead of request.json
-    print("Raw request data:", data)  # Debug log
-    
-    # Gemini API key check
-    if not config.get("GEMINI_API_KEY"):
-        return jsonify({"error": "Gemini API key is not configured. Please set GEMINI_API_KEY in your environment."}), 400
-    
+def get_scrape_params(data):
+    """Map the client's filter payload to scrape_auctions keyword arguments"""
     conduct_from = data.get('conductFrom')
     conduct_to = data.get('conductTo')
     posting_from = data.get('postingFrom')
@@ -85,7 +98,8 @@ def scrape():
     propertyParam = data.get('propertyParam')
     municipalityParam = data.get('municipalityParam')
     page = data.get('page', 1)  # new
-    
+    end_page = data.get('endPage')  # last page to crawl, or "all"
+
     print("Extracted parameters:")  # Debug log
     print(f"- conductFrom: {conduct_from}")
     print(f"- conductTo: {conduct_to}")
@@ -96,85 +110,251 @@ def scrape():
     print(f"- propertyParam: {propertyParam}")
     print(f"- municipalityParam: {municipalityParam}")
     print(f"- page: {page}")  # new
+    print(f"- endPage: {end_page}")
+
+    return {
+        "conduct_from": conduct_from,
+        "conduct_to": conduct_to,
+        "posting_from": posting_from,
+        "posting_to": posting_to,
+        "sort_by": sort_by,
+        "regionParam": regionParam,
+        "propertyParam": propertyParam,
+        "municipalityParam": municipalityParam,
+        "page": page,
+        "end_page": end_page,
+    }
+
+@app.route("/scrape", methods=["POST"])
+def scrape():
+    # Get filter parameters from request
+    data = request.get_json()  # Use get_json() instead of request.json
+    print("Raw request data:", data)  # Debug log
+    
+    # Gemini API key check
+    if not config.get("GEMINI_API_KEY"):
+        return jsonify({"error": "Gemini API key is not configured. Please set GEMINI_API_KEY in your environment."}), 400
+    
+    params = get_scrape_params(data)
+    try:
+        fields, layout = requested_fields(data), requested_layout(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Call scraper with filters
-    results = scrape_auctions(
-        conduct_from=conduct_from,
-        conduct_to=conduct_to,
-        posting_from=posting_from,
-        posting_to=posting_to,
-        sort_by=sort_by,
-        regionParam=regionParam,
-        propertyParam=propertyParam,
-        municipalityParam=municipalityParam,
-        page=page,  # new
-    )
+    results = scrape_auctions(**params)
     if 'error' in results:
         return jsonify({"error": results['error']}), 400
         
     # Format and send Telegram notification
-    num_results = len(results.get("results", []))
-    
-    # Check for special keywords like 'Hot' or 'Opportunity'
-    all_results = results.get("results", [])
-    hot_items = [item for item in all_results if "Hot" in item.get("ai_labels", [])]
-    
-    # Get opportunities that are not also "Hot" to avoid duplicates
-    opportunity_items = [
-        item for item in all_results
-        if item.get("simple_tag") == "Opportunity" and "Hot" not in item.get("ai_labels", [])
-    ]
-    
-    message = (
-        f"<b>Scraping Complete!</b>\n"
-        f"- Found: <b>{num_results}</b> results on this page."
-    )
-    
-    if hot_items:
-        message += f"\n\n<b>🔥 Hot Items ({len(hot_items)}):</b>"
-        for item in hot_items:
-            prop_type = item.get('property_type') or 'N/A'
-            address = item.get('address') or 'N/A'
-            price = item.get('price') or 'N/A'
-            area = item.get('property_area') or 'N/A'
-            price_per_sqm = item.get('price_per_sqm', 'N/A')
-            link = item.get('detail_link', '#')
-
-            message += (
-                f"\n--------------------------------------\n"
-                f"<b>{prop_type}</b> at {address}\n"
-                f"- Price: <b>{price}</b>\n"
-                f"- Area: {area} m²\n"
-                f"- Price per sq m: <b>{price_per_sqm}</b>\n"
-                f"- <a href=\"{link}\">View Details</a>"
-            )
-
-    if opportunity_items:
-        message += f"\n\n<b>💼 Other Opportunities ({len(opportunity_items)}):</b>"
-        for item in opportunity_items:
-            prop_type = item.get('property_type') or 'N/A'
-            address = item.get('address') or 'N/A'
-            price = item.get('price') or 'N/A'
-            area = item.get('property_area') or 'N/A'
-            price_per_sqm = item.get('price_per_sqm', 'N/A')
-            link = item.get('detail_link', '#')
-
-            message += (
-                f"\n--------------------------------------\n"
-                f"<b>{prop_type}</b> at {address}\n"
-                f"- Price: <b>{price}</b>\n"
-                f"- Area: {area} m²\n"
-                f"- Price per sq m: <b>{price_per_sqm}</b>\n"
-                f"- <a href=\"{link}\">View Details</a>"
-            )
-            
-    # Fallback message if no special items found
-    if not hot_items and not opportunity_items:
-        message += "\nNo special deals found in this batch."
-    
+    message = build_scrape_summary_message(results.get("results", []))
     send_telegram_notification(message)
     
-    return jsonify(results)
+    return json_response(dict(results, results=shape_results(results.get("results", []), fields, layout)))
+
+@app.route("/scrape/stream", methods=["POST"])
+def scrape_stream():
+    """Stream each auction as soon as it is labeled.
+
+    Every event is {"type": "result", "index": i, "item": {...}}, followed by
+    one {"type": "summary", "total_results": ...}. The default format is NDJSON
+    (one event per line); ?format=sse sends Server-Sent Events instead.
+    """
+    data = request.get_json() or {}
+    print("Raw stream request data:", data)  # Debug log
+
+    # Gemini API key check
+    if not config.get("GEMINI_API_KEY"):
+        return jsonify({"error": "Gemini API key is not configured. Please set GEMINI_API_KEY in your environment."}), 400
+
+    stream_format = request.args.get("format", data.get("format", "ndjson"))
+    if stream_format not in ("ndjson", "sse"):
+        return jsonify({"error": f"Unknown stream format {stream_format}. Use ndjson or sse."}), 400
+    params = get_scrape_params(data)
+
+    def encode(event):
+        payload = json.dumps(event, ensure_ascii=False, default=json_default)
+        if stream_format == "sse":
+            return f"event: {event['type']}\ndata: {payload}\n\n"
+        return payload + "\n"
+
+    def generate():
+        streamed_results = []
+        for kind, index, payload in iter_auctions(**params):
+            if kind == "result":
+                streamed_results.append((index, payload))
+                yield encode({"type": "result", "index": index, "item": payload})
+            else:
+                yield encode({"type": "summary", **payload})
+                if "error" not in payload and not payload.get("cancelled"):
+                    ordered = [item for _, item in sorted(streamed_results, key=lambda pair: pair[0])]
+                    send_telegram_notification(build_scrape_summary_message(ordered))
+
+    mimetype = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a scrape in the background and return its job id immediately"""
+    data = request.get_json() or {}
+    print("Raw job request data:", data)  # Debug log
+
+    # Gemini API key check
+    if not config.get("GEMINI_API_KEY"):
+        return jsonify({"error": "Gemini API key is not configured. Please set GEMINI_API_KEY in your environment."}), 400
+
+    job = job_manager.submit(get_scrape_params(data))
+    return jsonify(job.to_dict()), 202
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": [job.to_dict() for job in job_manager.list()]})
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/results", methods=["GET"])
+def job_results(job_id):
+    """Results of a job. With ?offset=N, only results finished after the first N
+    (in completion order) are returned, for incremental polling; without it the
+    results so far are returned in listing order."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    try:
+        fields, layout = requested_fields(), requested_layout()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Read the status first: once it says finished, every result is in place
+    response = job.to_dict()
+    offset = request.args.get("offset", type=int)
+    if offset is None:
+        results = job.ordered_results()
+        next_offset = len(results)
+    else:
+        results = job.results_since(max(0, offset))
+        next_offset = max(0, offset) + len(results)
+    response.update({"results": shape_results(results, fields, layout), "next_offset": next_offset})
+    return json_response(response)
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/rates", methods=["GET"])
+def request_rates():
+    """Current request rate and counters per host of the shared rate controller"""
+    return jsonify(rate_controller.snapshot())
+
+@app.route("/gemini/metrics", methods=["GET"])
+def gemini_metrics():
+    """Queue depth, budget use, retry counters and latency percentiles of Gemini calls"""
+    return jsonify(gemini_executor.snapshot())
+
+@app.route("/results", methods=["GET"])
+def query_results():
+    """Query every stored auction without scraping.
+
+    Filters: code, region, municipality, kind, status, simple_tag, label
+    (repeatable, all must match), date_from/date_to (dd/mm/YYYY or
+    YYYY-MM-DD), min_price/max_price, min_price_per_sqm/max_price_per_sqm.
+    sort is date, price, price_per_sqm or updated; prefix it with "-" for
+    descending order. Pages hold up to limit items; pass the returned
+    next_cursor as cursor to get the next page.
+    """
+    store = get_results_store()
+    if store is None:
+        return jsonify({"error": "The results store is disabled (RESULTS_STORE_ENABLED=false)."}), 404
+
+    args = request.args
+    filters = {
+        name: args.get(name)
+        for name in ("code", "region", "municipality", "kind", "status", "simple_tag")
+    }
+    filters["labels"] = args.getlist("label")
+    for name in ("date_from", "date_to"):
+        if args.get(name):
+            filters[name] = parse_query_date(args.get(name))
+            if filters[name] is None:
+                return jsonify({"error": f"Invalid {name}: {args.get(name)}. Use dd/mm/YYYY or YYYY-MM-DD."}), 400
+    for name in ("min_price", "max_price", "min_price_per_sqm", "max_price_per_sqm"):
+        if args.get(name):
+            filters[name] = args.get(name, type=float)
+            if filters[name] is None:
+                return jsonify({"error": f"Invalid {name}: {args.get(name)}"}), 400
+
+    try:
+        fields, layout = requested_fields(), requested_layout()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    sort = args.get("sort", "date")
+    limit = args.get("limit", 50, type=int)
+    try:
+        results, next_cursor = store.query(
+            filters,
+            sort=sort.lstrip("-"),
+            descending=sort.startswith("-"),
+            limit=limit,
+            cursor=args.get("cursor"),
+        )
+    except InvalidQuery as e:
+        return jsonify({"error": str(e)}), 400
+    return json_response({
+        "results": shape_results(results, fields, layout),
+        "count": len(results),
+        "next_cursor": next_cursor,
+    })
+
+@app.route("/labels/preview", methods=["GET"])
+def preview_labels():
+    """How many stored auctions would get each label under other thresholds.
+
+    Pass any of expensive_price_per_sqm, opportunity_price_per_sqm,
+    opportunity_min_area, opportunity_days and caution_price; the others keep
+    their configured values. Counts are given for the configured thresholds
+    (current) and the requested ones (preview). Nothing is stored.
+    """
+    store = get_results_store()
+    if store is None:
+        return jsonify({"error": "The results store is disabled (RESULTS_STORE_ENABLED=false)."}), 404
+    try:
+        thresholds = thresholds_with(
+            {name: request.args[name] for name in LABEL_THRESHOLDS if name in request.args}
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    records = [AuctionRecord.from_dict(item) for _, item in store.all_items()]
+    return jsonify(preview_counts(records, thresholds))
+
+@app.route("/labels/relabel", methods=["POST"])
+def relabel():
+    """Label every stored auction again with the configured thresholds"""
+    store = get_results_store()
+    if store is None:
+        return jsonify({"error": "The results store is disabled (RESULTS_STORE_ENABLED=false)."}), 404
+    changed = relabel_results(store)
+    return jsonify({"changed": changed, "thresholds": LABEL_THRESHOLDS})
 
 if __name__ == "__main__":
+    # With debug=True the reloader re-runs this file in a child process; only
+    # that child serves requests, so only it warms up the browser pool
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_browser_pool()
     app.run(debug=True)
+elif __name__ != "__mp_main__":
+    # PDF worker processes (started with forkserver, or spawn on Windows)
+    # import the main module as __mp_main__; they must not launch browsers
+    start_browser_pool()
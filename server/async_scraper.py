@@ -0,0 +1,1001 @@
+from playwright.async_api import async_playwright
+import asyncio
+import contextlib
+import random
+import re
+import weakref
+from browser_pool import ContextLease, launch_browser, new_browser_context
+from http_engine import (
+    NeedsBrowser,
+    fetch_html,
+    looks_like_challenge,
+    parse_detail_pdf_anchors,
+    parse_listing_html,
+)
+from gemini_pool import GeminiError, gemini_executor, new_gemini_batcher
+from http_clients import get_async_client
+from labeling import label_items
+from pdf_extract import PdfText, pdf_extractor
+from pipeline import Stage
+from records import AuctionRecord, parse_greek_number
+from rate_control import rate_controller
+from cache import content_hash, get_analysis_cache, get_auction_index, get_pdf_text_cache
+from pdf_store import get_pdf_store
+from results_store import get_results_store
+from rule_extractor import FREE_TEXT_FIELDS, RULES_ENABLED, fields_for_gemini, settled_rule_fields
+from scraper import (
+    GEMINI_FIELDS,
+    GEMINI_PROMPT_VERSION,
+    build_search_url,
+    clean_pdf_text,
+    config,
+    configure_gemini,
+    decode_gemini_analysis,
+    gemini_prompt,
+    get_random_user_agent,
+    normalize_listing_card,
+    select_pdf_links,
+)
+
+# Upper bound on detail page reads and PDF downloads in flight at once across
+# every scrape that shares an event loop.
+SCRAPE_CONCURRENCY = int(config.get("SCRAPE_CONCURRENCY") or 8)
+# Workers of the PDF download stage of a scrape
+PDF_DOWNLOAD_WORKERS = int(config.get("PDF_DOWNLOAD_WORKERS") or 4)
+# Characters of PDF text read for the analysis; extraction of a document
+# stops once it has collected them. The rules read all of it, Gemini gets the
+# most relevant GEMINI_INPUT_CHARS (see clean_pdf_text).
+ANALYSIS_CHAR_BUDGET = int(config.get("PDF_READ_CHARS") or 60000)
+
+_concurrency_limiters = weakref.WeakKeyDictionary()
+
+
+def get_concurrency_limiter():
+    """Return the global auction semaphore for the running event loop"""
+    loop = asyncio.get_running_loop()
+    limiter = _concurrency_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+        _concurrency_limiters[loop] = limiter
+    return limiter
+
+
+async def simulate_human_scrolling(page):
+    """Simulate human-like scrolling behavior"""
+    try:
+        # Random scroll down
+        scroll_distance = random.randint(200, 600)
+        await page.evaluate(f"window.scrollBy(0, {scroll_distance})")
+        await asyncio.sleep(random.uniform(0.2, 0.5))
+
+        # Sometimes scroll back up a bit
+        if random.random() < 0.3:
+            scroll_back = random.randint(100, 300)
+            await page.evaluate(f"window.scrollBy(0, -{scroll_back})")
+            await asyncio.sleep(random.uniform(0.2, 0.4))
+    except Exception as e:
+        print(f"Error during scrolling simulation: {e}")
+
+
+async def simulate_mouse_movement(page):
+    """Simulate random mouse movements"""
+    try:
+        # Move mouse to random positions
+        for _ in range(random.randint(1, 2)):
+            x = random.randint(100, 800)
+            y = random.randint(100, 600)
+            await page.mouse.move(x, y)
+            await asyncio.sleep(random.uniform(0.05, 0.15))
+    except Exception as e:
+        print(f"Error during mouse movement simulation: {e}")
+
+
+# Reads every listing card in one browser round trip. Missing elements come
+# back as null instead of waiting for a per-field timeout.
+LISTING_CARDS_SCRIPT = """
+() => Array.from(document.querySelectorAll("div.AList-BoxContainer")).map((card) => {
+    const text = (selector) => {
+        const el = card.querySelector(selector);
+        return el ? el.innerText.trim() : null;
+    };
+    const footer = Array.from(
+        card.querySelectorAll("div.AList-BoxFooter .AList-BoxFooterLeft .AList-BoxTextBlue500")
+    ).map((el) => el.innerText.trim());
+    const link = card.querySelector("a");
+    return {
+        date: text("div.AList-BoxMainCell2 .DateIcon"),
+        debtor: text("div.AList-BoxMainCell3 .AList-BoxTextBlueBold"),
+        kind: text("div.AList-BoxMainCell4 .AList-BoxTextBlueBold"),
+        location: text("div.AList-BoxMainCell4 .AList-BoxTextBlue"),
+        price: text("div.AList-Boxheader .AList-BoxheaderRight .AList-BoxTextPrice"),
+        status: text("div.AList-Boxheader .AList-BoxheaderLeft .AList-BoxTextBlueBold"),
+        post_date: footer.length > 0 ? footer[0] : null,
+        code: footer.length > 1 ? footer[1] : null,
+        part_label: text("div.AList-BoxFooter .AList-BoxFooterLeft b"),
+        href: link ? link.getAttribute("href") : null,
+    };
+})
+"""
+
+
+async def parse_listing_cards(p_page):
+    """Return the card dicts of every auction on a loaded listing page.
+    A card that cannot be normalized becomes an {"error": ...} item."""
+    try:
+        # One wait for the list itself replaces the per-field waits
+        await p_page.wait_for_selector("div.AList-BoxContainer", timeout=5000)
+    except Exception:
+        print("No auction cards rendered on listing page")
+    raw_cards = await p_page.evaluate(LISTING_CARDS_SCRIPT)
+    return normalize_cards(raw_cards)
+
+
+def normalize_cards(raw_cards):
+    """Normalize raw listing cards; a card that fails becomes an {"error": ...} item"""
+    print(f"Found {len(raw_cards)} auctions to process")
+    cards = []
+    for idx, raw in enumerate(raw_cards):
+        try:
+            card = normalize_listing_card(raw)
+            print(f"Basic info #{idx+1}: {card['kind']}, {card['region']}, {card['municipality']}")
+            cards.append(card)
+        except Exception as e:
+            print(f"Error parsing auction #{idx+1}: {e}")
+            cards.append({"error": f"Error parsing auction #{idx+1}: {e}"})
+    return cards
+
+
+async def read_total_results(p_page):
+    """Read the total auction count shown above the listing, 0 if missing"""
+    try:
+        # Wait for the element to be available before reading it
+        total_text_selector = ".AuctionsListSearchOrderingTbl .AuctionsList-resultstxt"
+        print(f"Waiting for selector: {total_text_selector}")
+        total_text_elem = await p_page.wait_for_selector(total_text_selector, timeout=15000)
+
+        total_text = (await total_text_elem.inner_text()).strip()
+        print(f"Raw text for total results: '{total_text}'")
+
+        match = re.search(r"\d+", total_text)
+        total_results = int(match.group()) if match else 0
+        print(f"Total results found: {total_results}")
+        return total_results
+    except Exception as e:
+        print(f"Could not extract total results: {e}")
+        return 0
+
+
+async def goto_paced(page, url):
+    """Load url in a browser page under the eauction.gr rate limit.
+    Challenge pages and error statuses lower the rate."""
+    async with rate_controller.request("eauction") as outcome:
+        response = await page.goto(url, timeout=60000)
+        status = response.status if response is not None else 200
+        if looks_like_challenge(status, await page.title()):
+            outcome.mark_challenge()
+        elif status >= 400:
+            outcome.mark_failed()
+    return response
+
+
+async def extract_pdf_links(detail_page, label="auction"):
+    """Return (all_pdf_links, pdf_href) from a loaded detail page"""
+    pdf_anchors = await detail_page.query_selector_all(
+        "div.AuctionDetailsPDFItem .AuctionDetailsPDFtext .DownloadAuctionFile"
+    )
+    pairs = [
+        (await anchor.get_attribute("href"), await anchor.get_attribute("title"))
+        for anchor in pdf_anchors
+    ]
+    return select_pdf_links(pairs, label)
+
+
+async def scrape_detail_page(detail_page, detail_link, label="auction"):
+    """Open an auction detail page and return (all_pdf_links, pdf_href)"""
+    print(f"Opening detail page for {label}")
+    await goto_paced(detail_page, detail_link)
+    return await extract_pdf_links(detail_page, label)
+
+
+async def fetch_detail_pdf_links(http_client, detail_link, label="auction", headers=None):
+    """Read the PDF links of a detail page over plain HTTP.
+    Raises NeedsBrowser when the page has to go through Playwright."""
+    print(f"Fetching detail page over HTTP for {label}")
+    html = await fetch_html(http_client, detail_link, headers)
+    return select_pdf_links(parse_detail_pdf_anchors(html), label)
+
+
+async def download_pdf(pdf_url, http_client, char_budget=None, headers=None):
+    """Fetch a PDF. Returns (pdf_text, content, digest): a PdfText when the
+    document's text is already in the PDF text cache (content is then None),
+    else the document for extract_and_cache_pdf_text, as a checkout of its file
+    in the PDF store (or as bytes when the store is disabled or has already
+    evicted it). char_budget is
+    the number of characters the caller will read (None: the whole
+    document); headers (e.g. BrowserSession.request_headers) override the
+    default ones.
+
+    Documents in the PDF store are only downloaded again once their TTL has
+    passed, and then with a conditional request that the server can answer
+    with 304 Not Modified.
+    """
+    cache = get_pdf_text_cache()
+    if cache:
+        cached = cache.get_fresh(pdf_url, char_budget)
+        if cached is not None:
+            print(f"Using cached PDF text for {pdf_url}")
+            return PdfText(*cached), None, None
+
+    store = get_pdf_store()
+    entry = store.lookup(pdf_url) if store else None
+    pinned = None
+    if entry:
+        # Checked out before anything else, so eviction cannot delete the file
+        # while it is revalidated or waits for the extraction stage
+        try:
+            pinned = store.checkout(entry["content_hash"])
+        except FileNotFoundError:
+            print(f"Stored PDF was evicted, downloading {pdf_url} again")
+            entry = None
+    try:
+        if entry and store.is_fresh(entry):
+            print(f"Using stored PDF for {pdf_url}")
+            digest = entry["content_hash"]
+            store.use(pdf_url, digest)
+        else:
+            # Set headers to mimic a real browser
+            headers = {
+                "User-Agent": get_random_user_agent(),
+                "Accept": "application/pdf,*/*",
+                "Accept-Language": "en-US,en;q=0.9",
+                "Upgrade-Insecure-Requests": "1",
+                **(headers or {}),
+                **(store.conditional_headers(entry) if entry else {}),
+            }
+
+            # Download the PDF
+            async with rate_controller.request("pdf"):
+                response = await http_client.get(pdf_url, headers=headers)
+                # raise_for_status() treats 304 Not Modified as an error
+                if not (response.status_code == 304 and entry):
+                    response.raise_for_status()
+
+            if response.status_code == 304 and entry:
+                print(f"Stored PDF still current for {pdf_url}")
+                digest = entry["content_hash"]
+                store.use(pdf_url, digest, revalidated=True)
+            else:
+                if pinned:
+                    store.release(pinned)
+                    pinned = None
+                if store:
+                    digest = store.put(
+                        pdf_url, response.content,
+                        response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                    )
+                    try:
+                        pinned = store.checkout(digest)
+                    except FileNotFoundError:
+                        # Evicted by another download already: read the bytes
+                        pass
+                else:
+                    digest = content_hash(response.content)
+
+        # Same document already parsed (possibly under another URL): skip PyPDF2
+        if cache:
+            cached = cache.get_by_hash(pdf_url, digest, char_budget)
+            if cached is not None:
+                print(f"PDF content unchanged, reusing cached text for {pdf_url}")
+                return PdfText(*cached), None, digest
+        if pinned is None:
+            return None, response.content, digest
+        # Handed over: extract_and_cache_pdf_text releases the checkout
+        content, pinned = pinned, None
+        return None, content, digest
+    finally:
+        if pinned:
+            store.release(pinned)
+
+
+async def extract_and_cache_pdf_text(pdf_url, content, digest, char_budget=None):
+    """Extract the PdfText of a downloaded PDF (bytes, or a PDF store checkout,
+    which is released), stopping at char_budget characters, and store it in
+    the PDF text cache"""
+    # PyPDF2 is CPU-bound; parse in the shared process pool
+    if isinstance(content, str):
+        try:
+            pdf_text = await pdf_extractor.extract_file(content, char_budget)
+        finally:
+            get_pdf_store().release(content)
+    else:
+        pdf_text = await pdf_extractor.extract(content, char_budget)
+    cache = get_pdf_text_cache()
+    if cache:
+        cache.put(
+            pdf_url, digest, pdf_text.text, pdf_text.page_offsets,
+            None if pdf_text.complete else char_budget,
+        )
+    return pdf_text
+
+
+async def analyze_pdf_with_gemini(text_content, model, fields=GEMINI_FIELDS):
+    """Analyze PDF content using Gemini with better prompt structure and few-shot guidance.
+    Only the keys in fields are asked for (see gemini_prompt).
+    Runs on the shared Gemini executor; raises GeminiError once retries are exhausted."""
+    if not model or not text_content:
+        return None
+
+    cleaned_text = clean_pdf_text(text_content)
+    return await gemini_executor.generate(model, gemini_prompt(fields) + "\n" + cleaned_text)
+
+
+async def get_pdf_analysis(pdf_text, model, batcher=None, doc_id=None, fields=GEMINI_FIELDS):
+    """Return the parsed Gemini analysis dict for PDF text, or None.
+
+    Gemini is asked only for fields, a tuple in GEMINI_FIELDS order. Results
+    are memoized in the analysis cache by GEMINI_PROMPT_VERSION and the hash
+    of the cleaned text and fields, so an unchanged document is never sent
+    twice for the same fields. With a batcher the document is sent together
+    with other auctions' documents, tagged with doc_id.
+    """
+    if not pdf_text:
+        return None
+
+    cache = get_analysis_cache(GEMINI_PROMPT_VERSION)
+    cleaned_text = clean_pdf_text(pdf_text)
+    # Answers for every field keep the plain text hash of older entries
+    key = cleaned_text if fields == GEMINI_FIELDS else f"{','.join(fields)}\n{cleaned_text}"
+    text_hash = content_hash(key)
+    if cache:
+        cached = cache.get(text_hash)
+        if cached is not None:
+            print(f"Using cached Gemini analysis {text_hash[:12]}")
+            return cached
+
+    if batcher:
+        data = await batcher.analyze(doc_id, cleaned_text, fields)
+    else:
+        data = decode_gemini_analysis(await analyze_pdf_with_gemini(pdf_text, model, fields))
+    if data is not None and cache:
+        cache.put(text_hash, data)
+    return data
+
+
+async def analyze_pdf_text(pdf_text, price, gemini_model, label="auction", batcher=None, code=None,
+                           complete=True):
+    """Analyze an auction's extracted PDF text (complete: the whole document).
+
+    The rule extractor reads the fields it can settle first, and Gemini is
+    only asked for the fields it could not settle plus GEMINI_REQUIRED_FIELDS
+    (see fields_for_gemini), and not called at all when that leaves nothing;
+    settled rule values take precedence over Gemini's answer.
+    Returns the pdf_analysis dict: empty if there was no usable answer, and
+    with an "analysis_error" if the Gemini call failed.
+    """
+    settled = settled_rule_fields(pdf_text, price, complete)
+    fields = fields_for_gemini(settled)
+    data = None
+    error = None
+    if gemini_model and fields:
+        try:
+            data = await get_pdf_analysis(pdf_text, gemini_model, batcher, code or label, fields)
+        except GeminiError as e:
+            print(f"Gemini analysis failed for {label}: {e}")
+            error = f"Gemini analysis failed: {e}"
+    elif gemini_model:
+        print(f"Rules settled the PDF fields of {label}, skipping Gemini")
+
+    if not data and not settled:
+        if error:
+            return {"analysis_error": error}
+        print(f"No Gemini analysis available for {label}")
+        return {}
+
+    # Free text fields Gemini was not asked for stay "N/A"
+    analysis = dict.fromkeys(FREE_TEXT_FIELDS, "N/A")
+    analysis.update(data or {})
+    analysis.update(settled)
+    analysis["analysis_source"] = "+".join(
+        source for source, used in (("rules", settled), ("gemini", data)) if used
+    )
+    if error:
+        analysis["analysis_error"] = error
+    print(f"PDF analysis completed for {label} ({analysis['analysis_source']})")
+    return analysis
+
+
+def reuse_indexed_analysis(entry, all_pdf_links, price):
+    """Return the indexed pdf_analysis of an auction, or None if the index
+    entry cannot stand in for a fresh analysis (unknown auction, different
+    PDF links, failed analysis or older prompt). The price per m² is derived
+    from the current list price by AuctionRecord, and a starting_price taken
+    from the indexed list price follows the current one (price)."""
+    if entry is None or entry["all_pdf_links"] != all_pdf_links:
+        return None
+    if not entry["pdf_href"]:
+        return {}
+    if (
+        entry["prompt_version"] != GEMINI_PROMPT_VERSION
+        or not entry["pdf_analysis"]
+        or "analysis_error" in entry["pdf_analysis"]
+    ):
+        return None
+    analysis = entry["pdf_analysis"]
+    listed = parse_greek_number(entry["price"])
+    if price != entry["price"] and listed is not None and analysis.get("starting_price") == listed:
+        analysis = {**analysis, "starting_price": parse_greek_number(price)}
+    return analysis
+
+
+async def scrape_auctions_async(
+    conduct_from=None,
+    conduct_to=None,
+    posting_from=None,
+    posting_to=None,
+    sort_by="auctionDateAsc",
+    regionParam=None,
+    propertyParam=None,
+    municipalityParam=None,
+    selectedRegion=None,
+    selectedMunicipality=None,
+    selectedPropertyType=None,
+    page=1,
+    detail_workers=None,
+    analysis_workers=None,
+    browser_pool=None,
+    on_result=None,
+    cancel_event=None,
+    engine=None,
+    end_page=None,
+):
+    """Scrape listing pages page..end_page on the running event loop.
+
+    end_page defaults to page (a single page); "all" crawls through the last
+    page. Every page is read in the same browser session, the total count is
+    read from the first one only, and auctions whose code already appeared on
+    an earlier page are skipped.
+
+    Auctions go through a staged pipeline (detail page, PDF download, text
+    extraction, Gemini analysis, labeling) whose stages run concurrently with
+    their own worker counts: detail_workers detail pages, PDF_DOWNLOAD_WORKERS
+    downloads, one extraction per pdf_extractor process and analysis_workers
+    Gemini analyses, while the loop wide SCRAPE_CONCURRENCY bounds page reads
+    and downloads across scrapes. Results keep list order and the result_item
+    shape of scrape_auctions.
+
+    With a browser_pool the scrape leases a warm context from it (and must run
+    on the pool loop); otherwise it launches and closes its own browser. The
+    browser is only started once a page actually needs it: with engine="http"
+    (default: the SCRAPE_ENGINE setting) pages are fetched over plain HTTP
+    first and Playwright is the fallback.
+
+    Auctions found in the auction index skip the PDF download and Gemini call
+    while their PDF links are unchanged (see reuse_indexed_analysis); only
+    their list-level fields come from this crawl. Within the recheck window
+    the links are compared over plain HTTP with engine="http", and not at all
+    with the browser (or when HTTP is blocked).
+
+    on_result(index, item) is called as soon as each auction is finished;
+    index is the auction's position across the whole crawl.
+    Setting cancel_event (a threading.Event) stops the scrape early; the output
+    then holds the auctions finished so far and "cancelled": True.
+    """
+    # Configure Gemini at the start
+    gemini_model = configure_gemini()
+
+    try:
+        page = int(page or 1)
+        if end_page in (None, ""):
+            end_page = page
+        elif end_page != "all":
+            end_page = int(end_page)
+    except (TypeError, ValueError):
+        error_msg = f"Invalid page range {page} to {end_page}."
+        print(error_msg)
+        return {"results": [], "total_results": 0, "error": error_msg}
+    if end_page != "all" and end_page < page:
+        error_msg = f"End page {end_page} cannot be before start page {page}."
+        print(error_msg)
+        return {"results": [], "total_results": 0, "error": error_msg}
+    print(f"Received pages: {page} to {end_page}")
+
+    def page_url(page_number):
+        return build_search_url(
+            conduct_from=conduct_from,
+            conduct_to=conduct_to,
+            posting_from=posting_from,
+            posting_to=posting_to,
+            sort_by=sort_by,
+            regionParam=regionParam,
+            propertyParam=propertyParam,
+            municipalityParam=municipalityParam,
+            page=page_number,
+        )
+
+    filter_context = {
+        "selectedRegion": selectedRegion,
+        "selectedMunicipality": selectedMunicipality,
+        "selectedPropertyType": selectedPropertyType,
+    }
+    detail_workers = max(1, int(detail_workers or config.get("DETAIL_WORKERS") or 4))
+    analysis_workers = max(1, int(analysis_workers or config.get("ANALYSIS_WORKERS") or 4))
+
+    engine = engine or config.get("SCRAPE_ENGINE") or "browser"
+
+    async with contextlib.AsyncExitStack() as stack:
+        session = BrowserSession(stack, browser_pool)
+        output = await _scrape_listing(
+            session, page_url, page, end_page, gemini_model, filter_context,
+            detail_workers, analysis_workers, engine, on_result, cancel_event,
+        )
+
+    print(f"\nCompleted scraping {len(output['results'])} auctions")
+    return output
+
+
+class BrowserSession:
+    """The browser side of one scrape, started only when a page needs it.
+
+    The first call to new_page() leases a context from the browser pool, or
+    launches a private browser when there is no pool; the exit stack closes it
+    when the scrape ends. Detail pages released with release_page() are
+    reused, so callers bound the number of pages by bounding concurrency.
+    request_headers() lets plain HTTP requests of the scrape present the same
+    identity as the browser.
+    """
+
+    def __init__(self, stack, browser_pool):
+        self._stack = stack
+        self._browser_pool = browser_pool
+        self._lease = None
+        self._lock = asyncio.Lock()
+        self._pages = []
+        self._free_pages = asyncio.Queue()
+        self.user_agent = get_random_user_agent()
+        self._browser_user_agent = None
+
+    async def _get_lease(self):
+        async with self._lock:
+            if self._lease is None:
+                if self._browser_pool:
+                    self._lease = await self._stack.enter_async_context(
+                        self._browser_pool.lease()
+                    )
+                else:
+                    p = await self._stack.enter_async_context(async_playwright())
+                    browser = await launch_browser(p)
+                    self._stack.push_async_callback(browser.close)
+                    context = await new_browser_context(browser)
+                    self._stack.push_async_callback(context.close)
+                    self._lease = ContextLease(context)
+                self._stack.push_async_callback(self._close_pages)
+            return self._lease
+
+    async def new_page(self):
+        lease = await self._get_lease()
+        page = await lease.context.new_page()
+        self._pages.append(page)
+        return page
+
+    async def acquire_page(self):
+        """Take a free detail page, or open one if none is free"""
+        if self._free_pages.empty():
+            return await self.new_page()
+        return self._free_pages.get_nowait()
+
+    def release_page(self, page):
+        self._free_pages.put_nowait(page)
+
+    def mark_failed(self):
+        if self._lease is not None:
+            self._lease.mark_failed()
+
+    async def request_headers(self, url, referer=None):
+        """Headers for a plain HTTP request to url: one user agent for the whole
+        scrape, and once the browser is open, its user agent and the cookies
+        its context holds for url (e.g. a passed challenge)"""
+        headers = {"User-Agent": self.user_agent}
+        if referer:
+            headers["Referer"] = referer
+        if self._lease is None or not self._pages:
+            return headers
+        try:
+            if self._browser_user_agent is None:
+                self._browser_user_agent = await self._pages[0].evaluate("navigator.userAgent")
+            headers["User-Agent"] = self._browser_user_agent
+            cookies = await self._lease.context.cookies(url)
+        except Exception as e:
+            print(f"Could not read browser cookies: {e}")
+            return headers
+        if cookies:
+            headers["Cookie"] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+        return headers
+
+    async def _close_pages(self):
+        # The context itself belongs to the pool or the exit stack
+        for page in self._pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+
+class AuctionWork:
+    """One auction on its way through the scrape pipeline"""
+
+    def __init__(self, index, card, future):
+        self.index = index
+        self.card = card
+        self.label = f"auction #{index+1}"
+        self.future = future  # set to the result_item by the label stage
+        self.index_entry = None
+        self.indexed_analysis = None  # reusable while the index entry is fresh
+        self.from_index = False
+        self.detail_read = False
+        self.all_pdf_links = []
+        self.pdf_href = None
+        self.pdf_content = None
+        self.pdf_digest = None
+        self.pdf_text = None  # PdfText
+        self.pdf_text_future = None  # shared with auctions linking the same PDF
+        self.pdf_analysis = None
+        self.result_item = None
+
+
+def _count_pages(total_results):
+    """Listing pages for a result count (20 auctions per page)"""
+    return (total_results + 19) // 20 if total_results and total_results > 0 else 1
+
+
+async def _watch_cancel(cancel_event, future):
+    """Cancel future once cancel_event is set from another thread"""
+    while not cancel_event.is_set():
+        await asyncio.sleep(0.5)
+    print("Cancellation requested, stopping scrape")
+    future.cancel()
+
+
+async def _scrape_listing(
+    session, page_url, first_page, end_page, gemini_model, filter_context,
+    detail_workers, analysis_workers, engine="browser", on_result=None, cancel_event=None,
+):
+    """Crawl listing pages first_page..end_page ("all": the last page) and
+    their auctions.
+
+    Listing pages are read one after the other in one browser page, while
+    the auctions of pages already read move through the pipeline stages in
+    the background; reading pauses while the detail stage's queue is full. With
+    engine="http" the listing and detail pages are first fetched over plain
+    HTTP and parsed locally; any page that looks like a challenge or lacks the
+    expected markup is loaded through the browser session instead.
+    """
+    use_http = engine == "http"
+    batcher = None
+    total_results = 0
+    total_pages = None
+    pages_scraped = []
+    cancelled = False
+    http_client = get_async_client()
+    listing_page = None
+
+    async def load_listing(page_number):
+        """Return (total_results, cards) of one listing page. total_results is
+        only read on the first page."""
+        nonlocal listing_page
+        url = page_url(page_number)
+        if use_http:
+            try:
+                print(f"Loading auction page {page_number} over HTTP...")
+                html = await fetch_html(http_client, url, await session.request_headers(url))
+                page_total, raw_cards = parse_listing_html(html)
+                return page_total, normalize_cards(raw_cards)
+            except NeedsBrowser as e:
+                print(f"Listing page needs the browser ({e}), falling back to Playwright")
+
+        if listing_page is None:
+            listing_page = await session.new_page()
+        print(f"Loading auction page {page_number}...")
+        await goto_paced(listing_page, url)
+        page_total = await read_total_results(listing_page) if total_pages is None else None
+        if total_pages is None and (page_number < 1 or page_number > _count_pages(page_total)):
+            # Invalid page: the caller reports it, no need to read the cards
+            return page_total, []
+
+        # Simulate human behavior on main page
+        await simulate_human_scrolling(listing_page)
+        await simulate_mouse_movement(listing_page)
+
+        return page_total, await parse_listing_cards(listing_page)
+
+    try:
+        limiter = get_concurrency_limiter()
+        auction_index = get_auction_index()
+        results_store = get_results_store()
+        batcher = new_gemini_batcher(gemini_model)
+        pdf_texts = {}  # pdf_href -> future PdfText, set by the first auction fetching it
+
+        async def read_detail(card, label, browser=True):
+            """Return (all_pdf_links, pdf_href) of an auction's detail page, or
+            None on errors (and, without browser, when it needs the browser)"""
+            if use_http:
+                try:
+                    return await fetch_detail_pdf_links(
+                        http_client, card["detail_link"], label,
+                        await session.request_headers(card["detail_link"]),
+                    )
+                except NeedsBrowser as e:
+                    print(f"Detail page for {label} needs the browser ({e})")
+                    if not browser:
+                        return None
+
+            detail_page = await session.acquire_page()
+            try:
+                return await scrape_detail_page(detail_page, card["detail_link"], label)
+            except Exception as e:
+                print(f"Error scraping detail page for {label}: {e}")
+                return None
+            finally:
+                session.release_page(detail_page)
+
+        # Every auction flows detail -> download -> extract -> analyze ->
+        # label, skipping the stages it does not need. Each stage hands the
+        # work on to the next one's bounded queue, so a stage that falls
+        # behind holds up its producers instead of piling up work.
+
+        async def feed(work):
+            """Send a listing card into the pipeline (waits while detail is full)"""
+            card = work.card
+            if "error" in card:
+                work.result_item = card
+                await label_stage.put(work)
+                return
+            entry = auction_index.get(card["code"], card["detail_link"]) if auction_index else None
+            work.index_entry = entry
+            if entry and auction_index.detail_is_fresh(entry):
+                pdf_analysis = reuse_indexed_analysis(entry, entry["all_pdf_links"], card["price"])
+                if pdf_analysis is not None:
+                    if use_http:
+                        # One plain request still checks the PDF links, so a
+                        # replaced document is noticed within the window
+                        work.indexed_analysis = pdf_analysis
+                        await detail_stage.put(work)
+                    else:
+                        await use_index(work, pdf_analysis)
+                    return
+            if card["detail_link"] == "N/A":
+                await label_stage.put(work)
+                return
+            await detail_stage.put(work)
+
+        async def use_index(work, pdf_analysis):
+            """Finish a known auction from its index entry, without its detail page"""
+            card, entry = work.card, work.index_entry
+            print(f"{work.label} ({card['code']}) is already indexed, skipping detail page and PDF")
+            if (entry["status"], entry["price"]) != (card["status"], card["price"]):
+                print(
+                    f"{work.label} changed: status {entry['status']} -> {card['status']}, "
+                    f"price {entry['price']} -> {card['price']}"
+                )
+            work.from_index = True
+            work.all_pdf_links, work.pdf_href = entry["all_pdf_links"], entry["pdf_href"]
+            work.pdf_analysis = pdf_analysis
+            await label_stage.put(work)
+
+        async def detail(work):
+            async with limiter:
+                links = await read_detail(work.card, work.label, work.indexed_analysis is None)
+            if links is None and work.indexed_analysis is not None:
+                # No browser for an auction checked within the recheck window
+                await use_index(work, work.indexed_analysis)
+                return
+            if links is not None:
+                work.detail_read = True
+                work.all_pdf_links, work.pdf_href = links
+                reused = reuse_indexed_analysis(work.index_entry, work.all_pdf_links, work.card["price"])
+                if reused is not None:
+                    print(f"PDF links of {work.label} unchanged, reusing indexed analysis")
+                    work.pdf_analysis = reused
+                    await label_stage.put(work)
+                    return
+            if work.pdf_href and (gemini_model or RULES_ENABLED):
+                await download_stage.put(work)
+            else:
+                await label_stage.put(work)
+
+        async def download(work):
+            shared = pdf_texts.get(work.pdf_href)
+            if shared is not None:
+                # Another part of the same auction (or another auction) links
+                # the same document: wait for its text instead of fetching it
+                print(f"{work.label} shares its PDF with an earlier auction")
+                work.pdf_text = await shared
+                if work.pdf_text is None:
+                    raise ValueError("the shared PDF could not be read")
+                await text_ready(work)
+                return
+            work.pdf_text_future = pdf_texts[work.pdf_href] = asyncio.get_running_loop().create_future()
+
+            print(f"Processing selected PDF for {work.label}")
+            headers = await session.request_headers(work.pdf_href, work.card["detail_link"])
+            async with limiter:
+                work.pdf_text, work.pdf_content, work.pdf_digest = await download_pdf(
+                    work.pdf_href, http_client, ANALYSIS_CHAR_BUDGET, headers
+                )
+            if work.pdf_text is None:
+                await extract_stage.put(work)
+            else:
+                await text_ready(work)
+
+        async def extract(work):
+            content, work.pdf_content = work.pdf_content, None
+            work.pdf_text = await extract_and_cache_pdf_text(
+                work.pdf_href, content, work.pdf_digest, ANALYSIS_CHAR_BUDGET
+            )
+            await text_ready(work)
+
+        async def text_ready(work):
+            if work.pdf_text_future is not None:
+                work.pdf_text_future.set_result(work.pdf_text)
+                work.pdf_text_future = None
+            if work.pdf_text.text:
+                await analyze_stage.put(work)
+            else:
+                print(f"Could not extract text from PDF for {work.label}")
+                await label_stage.put(work)
+
+        async def analyze(work):
+            work.pdf_analysis = await analyze_pdf_text(
+                work.pdf_text.text, work.card["price"], gemini_model, work.label, batcher, work.card["code"],
+                work.pdf_text.complete,
+            )
+            work.pdf_text = None
+            await label_stage.put(work)
+
+        async def label_auction(work):
+            if work.result_item is None:
+                card = work.card
+                pdf_analysis = work.pdf_analysis or {}
+                if auction_index and work.from_index:
+                    auction_index.refresh(card, pdf_analysis)
+                elif auction_index and work.detail_read:
+                    auction_index.record(
+                        card, work.pdf_href, work.all_pdf_links, pdf_analysis, GEMINI_PROMPT_VERSION
+                    )
+                work.result_item = AuctionRecord(
+                    card, work.pdf_href, work.all_pdf_links, pdf_analysis, filter_context
+                )
+                label_items([work.result_item])
+                print(f"Completed processing {work.label}")
+            finish(work)
+
+        def finish(work):
+            if results_store and isinstance(work.result_item, AuctionRecord):
+                try:
+                    results_store.save(work.result_item)
+                except Exception as e:
+                    print(f"Error storing {work.label}: {e}")
+            if on_result:
+                try:
+                    on_result(work.index, work.result_item)
+                except Exception as e:
+                    print(f"Error in result callback for {work.label}: {e}")
+            if not work.future.done():
+                work.future.set_result(work.result_item)
+
+        async def detail_failed(work, e):
+            print(f"Error parsing {work.label}: {e}")
+            work.result_item = {"error": f"Error parsing {work.label}: {e}"}
+            await label_stage.put(work)
+
+        async def pdf_failed(work, e):
+            # The auction is still reported, without PDF analysis
+            print(f"Error processing PDF for {work.label}: {e}")
+            if work.pdf_text_future is not None:
+                work.pdf_text_future.set_result(None)
+                work.pdf_text_future = None
+            work.pdf_content = work.pdf_text = None
+            work.pdf_analysis = {}
+            await label_stage.put(work)
+
+        async def label_failed(work, e):
+            print(f"Error parsing {work.label}: {e}")
+            work.result_item = {"error": f"Error parsing {work.label}: {e}"}
+            finish(work)
+
+        detail_stage = Stage("detail", detail, detail_workers, detail_failed)
+        download_stage = Stage("download", download, PDF_DOWNLOAD_WORKERS, pdf_failed)
+        extract_stage = Stage("extract", extract, pdf_extractor.workers, pdf_failed)
+        analyze_stage = Stage("analyze", analyze, analysis_workers, pdf_failed)
+        label_stage = Stage("label", label_auction, 1, label_failed, queue_size=64)
+        stages = (detail_stage, download_stage, extract_stage, analyze_stage, label_stage)
+        for stage in stages:
+            stage.start()
+
+        # One entry per result in crawl order: auction futures (resolved by the
+        # label stage), plus finished futures for page errors
+        entries = []
+        seen_codes = set()
+
+        async def crawl():
+            nonlocal total_results, total_pages, end_page
+            page_number = first_page
+            while total_pages is None or page_number <= end_page:
+                try:
+                    page_total, cards = await load_listing(page_number)
+                except Exception as e:
+                    print(f"Error loading page {page_number} or extracting data: {e}")
+                    error = asyncio.get_running_loop().create_future()
+                    error.set_result({"error": f"Error loading page {page_number} or extracting data: {e}"})
+                    entries.append(error)
+                    session.mark_failed()
+                    break
+
+                if total_pages is None:
+                    total_results = page_total or 0
+                    total_pages = _count_pages(total_results)
+                    print(f"Total pages: {total_pages}")
+                    # Validate the requested pages
+                    if first_page < 1 or first_page > total_pages:
+                        return f"Requested page {first_page} is not valid. Total pages available: {total_pages}."
+                    end_page = total_pages if end_page == "all" else min(end_page, total_pages)
+
+                pages_scraped.append(page_number)
+                for card in cards:
+                    code = card.get("code")
+                    if code and code != "N/A":
+                        if code in seen_codes:
+                            print(f"Skipping auction {code} from page {page_number}, already listed")
+                            continue
+                        seen_codes.add(code)
+                    work = AuctionWork(len(entries), card, asyncio.get_running_loop().create_future())
+                    entries.append(work.future)
+                    await feed(work)
+                page_number += 1
+
+            await asyncio.gather(*entries)
+            return None
+
+        crawl_task = asyncio.ensure_future(crawl())
+        watcher = (
+            asyncio.ensure_future(_watch_cancel(cancel_event, crawl_task))
+            if cancel_event
+            else None
+        )
+        try:
+            error_msg = await crawl_task
+            if error_msg:
+                print(error_msg)
+                return {"results": [], "total_results": total_results, "error": error_msg}
+        except asyncio.CancelledError:
+            if not (cancel_event and cancel_event.is_set()):
+                raise
+            cancelled = True
+            for entry in entries:
+                entry.cancel()
+        finally:
+            if watcher:
+                watcher.cancel()
+            for stage in stages:
+                stage.stop()
+            print("Pipeline stages: " + ", ".join(
+                f"{stage.name} {stage.processed} in {stage.busy_seconds:.1f}s" for stage in stages
+            ))
+        results = [entry.result() for entry in entries if entry.done() and not entry.cancelled()]
+
+    except Exception as e:
+        print(f"Error loading page or extracting data: {e}")
+        results = [{"error": f"Error loading page or extracting data: {e}"}]
+        session.mark_failed()
+    finally:
+        if batcher:
+            batcher.cancel()
+
+    output = {
+        "results": results,
+        "total_results": total_results,
+        "total_pages": total_pages,
+        "pages_scraped": pages_scraped,
+    }
+    if cancelled:
+        output["cancelled"] = True
+    return output
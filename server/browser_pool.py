@@ -0,0 +1,242 @@
+from playwright.async_api import async_playwright
+import asyncio
+import atexit
+import contextlib
+import random
+import threading
+from scraper import config, get_random_user_agent
+
+
+async def launch_browser(p):
+    """Launch Chromium with more realistic settings"""
+    return await p.chromium.launch(
+        headless=False,
+        args=[
+            "--disable-blink-features=AutomationControlled",
+            "--disable-dev-shm-usage",
+            "--disable-extensions",
+            "--no-sandbox",
+            "--disable-web-security",
+            "--disable-features=VizDisplayCompositor",
+        ],
+    )
+
+
+async def new_browser_context(browser):
+    """Create a context with a random user agent and no webdriver flag"""
+    context = await browser.new_context(
+        user_agent=get_random_user_agent(),
+        viewport={
+            "width": random.randint(1200, 1920),
+            "height": random.randint(800, 1080),
+        },
+        locale="en-US",
+        timezone_id="Europe/Athens",
+    )
+
+    # Remove webdriver property
+    await context.add_init_script(
+        """
+        Object.defineProperty(navigator, 'webdriver', {
+            get: () => undefined,
+        });
+    """
+    )
+    return context
+
+
+class ContextLease:
+    """A browser context handed to one scrape; mark_failed() gets it recycled"""
+
+    def __init__(self, context):
+        self.context = context
+        self.failed = False
+
+    def mark_failed(self):
+        self.failed = True
+
+
+class _PooledContext:
+    def __init__(self, browser_index):
+        self.browser_index = browser_index
+        self.context = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """Warm Chromium browsers and contexts shared by all /scrape requests.
+
+    The pool owns a background thread running its own event loop, which is
+    where every pooled scrape runs (see run()). Each browser keeps
+    contexts_per_browser contexts. A context is leased to one scrape at a time
+    and replaced after max_uses leases or as soon as a scrape fails with it.
+    Crashed browsers are relaunched on the next lease.
+    """
+
+    def __init__(self, size=1, contexts_per_browser=2, max_uses=20):
+        self.size = max(1, size)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.max_uses = max(1, max_uses)
+        self.loop = None
+        self._thread = None
+        self._playwright = None
+        self._browsers = []
+        self._idle = None
+        self._entries = []
+        self._closed = False
+
+    def start(self):
+        """Start the pool thread and launch the browsers and contexts"""
+        ready = threading.Event()
+
+        def run_loop():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            ready.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run_loop, name="browser-pool", daemon=True)
+        self._thread.start()
+        ready.wait()
+        try:
+            asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        except Exception:
+            self.shutdown()
+            raise
+        print(
+            f"Browser pool ready: {self.size} browser(s), "
+            f"{self.size * self.contexts_per_browser} context(s)"
+        )
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        for i in range(self.size):
+            self._browsers.append(await launch_browser(self._playwright))
+            for _ in range(self.contexts_per_browser):
+                entry = _PooledContext(i)
+                entry.context = await new_browser_context(self._browsers[i])
+                self._entries.append(entry)
+                self._idle.put_nowait(entry)
+
+    def run(self, coro):
+        """Run a coroutine on the pool loop and block until it finishes"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _ensure_browser(self, index):
+        browser = self._browsers[index]
+        if not browser.is_connected():
+            print(f"Browser #{index+1} disconnected, relaunching")
+            self._browsers[index] = await launch_browser(self._playwright)
+        return self._browsers[index]
+
+    async def _recycle(self, entry):
+        """Close a worn out context and warm up its replacement"""
+        old_context, entry.context, entry.uses = entry.context, None, 0
+        if old_context is not None:
+            try:
+                await old_context.close()
+            except Exception as e:
+                print(f"Error closing pooled context: {e}")
+        try:
+            browser = await self._ensure_browser(entry.browser_index)
+            entry.context = await new_browser_context(browser)
+        except Exception as e:
+            # Retried on the next lease of this slot
+            print(f"Error creating pooled context: {e}")
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        """Lease a warm context for the duration of one scrape"""
+        if self._closed:
+            raise RuntimeError("Browser pool is shut down")
+        entry = await self._idle.get()
+        lease = None
+        try:
+            if entry.context is None:
+                browser = await self._ensure_browser(entry.browser_index)
+                entry.context = await new_browser_context(browser)
+            lease = ContextLease(entry.context)
+            yield lease
+        except BaseException:
+            if lease is not None:
+                lease.mark_failed()
+            raise
+        finally:
+            entry.uses += 1
+            if lease is None or lease.failed or entry.uses >= self.max_uses:
+                asyncio.get_running_loop().create_task(self._refill(entry))
+            else:
+                self._idle.put_nowait(entry)
+
+    async def _refill(self, entry):
+        await self._recycle(entry)
+        self._idle.put_nowait(entry)
+
+    async def _close(self):
+        for entry in self._entries:
+            if entry.context is not None:
+                with contextlib.suppress(Exception):
+                    await entry.context.close()
+        for browser in self._browsers:
+            with contextlib.suppress(Exception):
+                await browser.close()
+        if self._playwright is not None:
+            with contextlib.suppress(Exception):
+                await self._playwright.stop()
+
+    def shutdown(self):
+        """Close every context and browser and stop the pool thread"""
+        if self._closed or self.loop is None:
+            return
+        self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout=30)
+        except Exception as e:
+            print(f"Error shutting down browser pool: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=10)
+        print("Browser pool shut down")
+
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+
+def start_browser_pool():
+    """Start the process-wide browser pool unless BROWSER_POOL_SIZE is 0.
+    Returns the pool, or None when disabled or when browsers fail to launch."""
+    global _browser_pool
+    size = int(config.get("BROWSER_POOL_SIZE") or 1)
+    if size <= 0:
+        return None
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            pool = BrowserPool(
+                size=size,
+                contexts_per_browser=int(config.get("CONTEXTS_PER_BROWSER") or 2),
+                max_uses=int(config.get("CONTEXT_MAX_USES") or 20),
+            )
+            try:
+                pool.start()
+            except Exception as e:
+                print(f"Could not start browser pool, scrapes will launch their own browser: {e}")
+                return None
+            atexit.register(pool.shutdown)
+            _browser_pool = pool
+        return _browser_pool
+
+
+def get_browser_pool():
+    """Return the running browser pool, or None"""
+    return _browser_pool
+
+
+def stop_browser_pool():
+    """Shut down the process-wide browser pool if it is running"""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is not None:
+            _browser_pool.shutdown()
+            _browser_pool = None
@@ -0,0 +1,397 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import dotenv_values
+
+config = dotenv_values()  # Load .env file into a dictionary
+
+CACHE_DIR = config.get("CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache"
+)
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of bytes or text"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class _SqliteStore:
+    """Small thread-safe wrapper around a single SQLite file"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _stored_text(text, page_offsets, char_budget):
+    # Rows cached before page offsets were recorded count as a single page
+    return text, json.loads(page_offsets) if page_offsets else [0], char_budget is None
+
+
+class PdfTextCache(_SqliteStore):
+    """On-disk cache of extracted PDF text.
+
+    Text is stored once per content hash, and every PDF URL points at the hash
+    of the document it served last. A URL entry younger than the TTL is used
+    without touching the network. Older entries are revalidated by downloading
+    the file again: if its hash is already known, the stored text is reused and
+    PyPDF2 parsing is skipped. When the stored text grows past ``max_bytes``
+    the least recently used documents are evicted.
+
+    Text extracted only up to a character budget is stored with that budget
+    and served only to callers asking for at most as many characters.
+    """
+
+    def __init__(self, path, max_bytes, ttl_seconds):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pdf_texts (
+                    content_hash TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pdf_texts_accessed
+                    ON pdf_texts (accessed_at);
+                CREATE TABLE IF NOT EXISTS pdf_urls (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    validated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pdf_urls_hash
+                    ON pdf_urls (content_hash);
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pdf_texts)")}
+            # Caches written before extraction budgets held whole documents
+            if "char_budget" not in columns:
+                self._conn.execute("ALTER TABLE pdf_texts ADD COLUMN char_budget INTEGER")
+            if "page_offsets" not in columns:
+                self._conn.execute("ALTER TABLE pdf_texts ADD COLUMN page_offsets TEXT")
+
+    # Stored text is usable if it is complete or was cut at a budget at least
+    # as large as the one asked for
+    _BUDGET_MATCH = "(t.char_budget IS NULL OR t.char_budget >= ?)"
+
+    def get_fresh(self, url, char_budget=None):
+        """Return (text, page_offsets, complete) for a URL validated within the
+        TTL, else None. char_budget is the number of characters the caller
+        needs (None: the whole document)."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT t.content_hash, t.text, t.page_offsets, t.char_budget FROM pdf_urls u "
+                "JOIN pdf_texts t ON t.content_hash = u.content_hash "
+                f"WHERE u.url = ? AND u.validated_at >= ? AND {self._BUDGET_MATCH}",
+                (url, now - self.ttl_seconds, char_budget or float("inf")),
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute(
+                "UPDATE pdf_texts SET accessed_at = ? WHERE content_hash = ?",
+                (now, row[0]),
+            )
+        return _stored_text(*row[1:])
+
+    def get_by_hash(self, url, digest, char_budget=None):
+        """Return (text, page_offsets, complete) stored for a downloaded
+        document and mark the URL revalidated, else None"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT text, page_offsets, char_budget FROM pdf_texts t "
+                f"WHERE content_hash = ? AND {self._BUDGET_MATCH}",
+                (digest, char_budget or float("inf")),
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute(
+                "UPDATE pdf_texts SET accessed_at = ? WHERE content_hash = ?",
+                (now, digest),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_urls (url, content_hash, validated_at) "
+                "VALUES (?, ?, ?)",
+                (url, digest, now),
+            )
+        return _stored_text(*row)
+
+    def put(self, url, digest, text, page_offsets=None, char_budget=None):
+        """Store extracted text for a document and evict old entries if needed.
+        char_budget is the character budget extraction stopped at, if it did."""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_texts (content_hash, text, size, accessed_at, "
+                "char_budget, page_offsets) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    digest, text, size, now, char_budget,
+                    json.dumps(page_offsets) if page_offsets is not None else None,
+                ),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_urls (url, content_hash, validated_at) "
+                "VALUES (?, ?, ?)",
+                (url, digest, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used texts until the cache fits in max_bytes"""
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pdf_texts"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT content_hash, size FROM pdf_texts ORDER BY accessed_at ASC"
+        ).fetchall()
+        for digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pdf_texts WHERE content_hash = ?", (digest,))
+            self._conn.execute("DELETE FROM pdf_urls WHERE content_hash = ?", (digest,))
+            total -= size
+            print(f"Evicted cached PDF text {digest[:12]} ({size} bytes)")
+
+
+class AnalysisCache(_SqliteStore):
+    """Persistent memo of parsed Gemini analyses.
+
+    Entries are keyed by the hash of the cleaned document text and the prompt
+    version that produced them. Opening the cache with a new prompt version
+    drops every entry written by older prompts.
+    """
+
+    def __init__(self, path, prompt_version):
+        super().__init__(path)
+        self.prompt_version = prompt_version
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    text_hash TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (text_hash, prompt_version)
+                );
+                """
+            )
+        removed = self.invalidate_other_versions()
+        if removed:
+            print(f"Invalidated {removed} cached analyses from older prompt versions")
+
+    def get(self, text_hash):
+        """Return the cached analysis dict for a document hash, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM analyses WHERE text_hash = ? AND prompt_version = ?",
+                (text_hash, self.prompt_version),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, text_hash, result):
+        """Store a parsed analysis dict for a document hash"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (text_hash, prompt_version, result, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (text_hash, self.prompt_version, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+
+    def invalidate_other_versions(self):
+        """Delete analyses produced by any prompt version but the current one"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM analyses WHERE prompt_version != ?", (self.prompt_version,)
+            )
+        return cursor.rowcount
+
+    def clear(self):
+        """Delete every cached analysis"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM analyses")
+        return cursor.rowcount
+
+
+class AuctionIndex(_SqliteStore):
+    """Auctions seen by earlier crawls, keyed by auction code and detail link.
+
+    Each entry keeps the last list-level fields (status, price), the PDF links
+    of the detail page and the analysis of the selected PDF together with the
+    prompt version that produced it. The scraper uses it to skip the detail
+    page for auctions whose links were checked within ``recheck_seconds``
+    (unless it can read the page over plain HTTP), and to skip the PDF
+    download and Gemini call whenever the links are unchanged.
+    """
+
+    def __init__(self, path, recheck_seconds):
+        super().__init__(path)
+        self.recheck_seconds = recheck_seconds
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS auctions (
+                    code TEXT NOT NULL,
+                    detail_link TEXT NOT NULL,
+                    status TEXT,
+                    price TEXT,
+                    pdf_href TEXT,
+                    all_pdf_links TEXT NOT NULL,
+                    pdf_analysis TEXT NOT NULL,
+                    prompt_version TEXT,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    detail_checked_at REAL NOT NULL,
+                    PRIMARY KEY (code, detail_link)
+                );
+                """
+            )
+
+    def get(self, code, detail_link):
+        """Return the indexed entry of an auction as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, price, pdf_href, all_pdf_links, pdf_analysis, "
+                "prompt_version, detail_checked_at FROM auctions "
+                "WHERE code = ? AND detail_link = ?",
+                (code, detail_link),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "status": row[0],
+            "price": row[1],
+            "pdf_href": row[2],
+            "all_pdf_links": json.loads(row[3]),
+            "pdf_analysis": json.loads(row[4]),
+            "prompt_version": row[5],
+            "detail_checked_at": row[6],
+        }
+
+    def detail_is_fresh(self, entry):
+        """True if the entry's PDF links were read within recheck_seconds"""
+        return entry["detail_checked_at"] >= time.time() - self.recheck_seconds
+
+    def record(self, card, pdf_href, all_pdf_links, pdf_analysis, prompt_version):
+        """Store an auction whose detail page was just read"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO auctions (code, detail_link, status, price, pdf_href, "
+                "all_pdf_links, pdf_analysis, prompt_version, first_seen, last_seen, "
+                "detail_checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (code, detail_link) DO UPDATE SET status = excluded.status, "
+                "price = excluded.price, pdf_href = excluded.pdf_href, "
+                "all_pdf_links = excluded.all_pdf_links, pdf_analysis = excluded.pdf_analysis, "
+                "prompt_version = excluded.prompt_version, last_seen = excluded.last_seen, "
+                "detail_checked_at = excluded.detail_checked_at",
+                (
+                    card["code"],
+                    card["detail_link"],
+                    card["status"],
+                    card["price"],
+                    pdf_href,
+                    json.dumps(all_pdf_links),
+                    json.dumps(pdf_analysis, ensure_ascii=False),
+                    prompt_version,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+
+    def refresh(self, card, pdf_analysis):
+        """Update the list-level fields of a known auction seen again in a
+        listing, and its pdf_analysis as reused for the current price"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE auctions SET status = ?, price = ?, pdf_analysis = ?, last_seen = ? "
+                "WHERE code = ? AND detail_link = ?",
+                (
+                    card["status"],
+                    card["price"],
+                    json.dumps(pdf_analysis, ensure_ascii=False),
+                    time.time(),
+                    card["code"],
+                    card["detail_link"],
+                ),
+            )
+
+    def clear(self):
+        """Forget every indexed auction"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM auctions")
+        return cursor.rowcount
+
+
+_pdf_text_cache = None
+_pdf_text_cache_lock = threading.Lock()
+
+
+def get_pdf_text_cache():
+    """Return the process-wide PDF text cache, or None if disabled"""
+    global _pdf_text_cache
+    if config.get("PDF_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _pdf_text_cache_lock:
+        if _pdf_text_cache is None:
+            _pdf_text_cache = PdfTextCache(
+                os.path.join(CACHE_DIR, "pdf_text.sqlite3"),
+                max_bytes=int(float(config.get("PDF_CACHE_MAX_MB") or 256) * 1024 * 1024),
+                ttl_seconds=float(config.get("PDF_CACHE_TTL_HOURS") or 24) * 3600,
+            )
+        return _pdf_text_cache
+
+
+_analysis_caches = {}
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache(prompt_version):
+    """Return the process-wide analysis cache for a prompt version, or None if disabled"""
+    if config.get("ANALYSIS_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _analysis_cache_lock:
+        if prompt_version not in _analysis_caches:
+            _analysis_caches[prompt_version] = AnalysisCache(
+                os.path.join(CACHE_DIR, "analysis.sqlite3"), prompt_version
+            )
+        return _analysis_caches[prompt_version]
+
+
+_auction_index = None
+_auction_index_lock = threading.Lock()
+
+
+def get_auction_index():
+    """Return the process-wide auction index, or None if incremental crawling is disabled"""
+    global _auction_index
+    if config.get("AUCTION_INDEX_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _auction_index_lock:
+        if _auction_index is None:
+            _auction_index = AuctionIndex(
+                os.path.join(CACHE_DIR, "auction_index.sqlite3"),
+                recheck_seconds=float(config.get("AUCTION_INDEX_RECHECK_HOURS") or 168) * 3600,
+            )
+        return _auction_index
@@ -0,0 +1,315 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+from google.api_core import exceptions as google_exceptions
+from rate_control import rate_controller
+from scraper import (
+    GEMINI_FIELDS,
+    config,
+    decode_gemini_analysis,
+    decode_gemini_batch,
+    gemini_batch_prompt,
+    gemini_prompt,
+)
+
+# Errors worth another attempt: quota, overload and server side failures
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+LATENCY_SAMPLES = 500
+
+
+class GeminiError(Exception):
+    """A Gemini call failed for good (after retries, or with a permanent error)"""
+
+
+def estimate_tokens(text):
+    """Rough input token count; Greek text averages about 3 characters per token"""
+    return len(text) // 3 + 1
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+class GeminiExecutor:
+    """Runs Gemini calls for every scrape in the process.
+
+    A call is admitted once fewer than ``concurrency`` calls are in flight and
+    the last minute's requests and tokens leave room in the rpm / tpm budget.
+    Each attempt gets ``deadline_seconds``; quota, overload and timeout errors
+    are retried up to ``max_retries`` times with jittered exponential backoff.
+    Admission is shared between threads and event loops, so scrapes on the
+    browser pool loop and on their own loops draw from the same budget.
+    """
+
+    def __init__(self, concurrency=4, rpm=60, tpm=1_000_000, max_retries=4,
+                 deadline_seconds=60, backoff_seconds=2, max_backoff_seconds=60):
+        self.concurrency = max(1, concurrency)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.deadline_seconds = deadline_seconds
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._lock = threading.Lock()
+        self._window = collections.deque()  # (admitted_at, tokens) of the last minute
+        self._window_tokens = 0
+        self._in_flight = 0
+        self._waiting = 0
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._counters = collections.Counter()
+
+    def _try_admit(self, tokens):
+        """Reserve a slot and budget for a call, or return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and self._window[0][0] <= now - 60:
+                self._window_tokens -= self._window.popleft()[1]
+            if self._in_flight >= self.concurrency:
+                return 0.05
+            over_rpm = len(self._window) >= self.rpm
+            # A single call larger than the whole budget is let through alone
+            over_tpm = bool(self._window) and self._window_tokens + tokens > self.tpm
+            if over_rpm or over_tpm:
+                return max(0.05, self._window[0][0] + 60 - now)
+            self._window.append((now, tokens))
+            self._window_tokens += tokens
+            self._in_flight += 1
+            return None
+
+    async def _admit(self, tokens):
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                wait = self._try_admit(tokens)
+                if wait is None:
+                    return
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _release(self, latency=None):
+        with self._lock:
+            self._in_flight -= 1
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _backoff(self, attempt):
+        """Full jitter: uniform between 0 and the exponential cap"""
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    async def generate(self, model, prompt, deadline_seconds=None):
+        """Return the text of model's answer to prompt. Raises GeminiError."""
+        tokens = estimate_tokens(prompt)
+        deadline_seconds = deadline_seconds or self.deadline_seconds
+        for attempt in range(self.max_retries + 1):
+            await self._admit(tokens)
+            start = time.monotonic()
+            try:
+                async with rate_controller.request("gemini"):
+                    response = await asyncio.wait_for(
+                        model.generate_content_async(prompt), deadline_seconds
+                    )
+                    text = response.text
+            except RETRYABLE_ERRORS as e:
+                self._release()
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else type(e).__name__
+                self._count("timeouts" if reason == "timeout" else "transient_errors")
+                if attempt == self.max_retries:
+                    self._count("failed")
+                    raise GeminiError(f"{reason} after {attempt + 1} attempts")
+                delay = self._backoff(attempt)
+                self._count("retries")
+                print(f"Gemini call failed ({reason}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except Exception as e:
+                # Permanent: invalid request, blocked prompt, bad API key...
+                self._release()
+                self._count("failed")
+                raise GeminiError(f"{type(e).__name__}: {e}")
+            except BaseException:
+                # Cancelled scrape
+                self._release()
+                raise
+            self._release(time.monotonic() - start)
+            self._count("completed")
+            return text
+
+    def snapshot(self):
+        """Queue depth, in-flight calls, budget use, counters and latency percentiles"""
+        with self._lock:
+            now = time.monotonic()
+            recent = [(t, n) for t, n in self._window if t > now - 60]
+            latencies = sorted(self._latencies)
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "concurrency": self.concurrency,
+                "requests_last_minute": len(recent),
+                "rpm": self.rpm,
+                "tokens_last_minute": sum(n for _, n in recent),
+                "tpm": self.tpm,
+                "latency_seconds": {
+                    "p50": _percentile(latencies, 0.5),
+                    "p90": _percentile(latencies, 0.9),
+                    "p99": _percentile(latencies, 0.99),
+                    "samples": len(latencies),
+                },
+                **{name: self._counters[name] for name in (
+                    "completed", "retries", "timeouts", "transient_errors", "failed"
+                )},
+            }
+
+
+class GeminiBatcher:
+    """Packs the single-document analyses of one scrape into multi-document calls.
+
+    analyze() queues a cleaned document under its auction code, in one queue
+    per set of requested fields, since a batch shares one gemini_batch_prompt.
+    A queue is sent as one request once it holds max_docs documents, once
+    another document would take it past max_tokens, or max_wait seconds after
+    its first document arrived. Documents the batch answer does not cover (or
+    all of them, if the call or its JSON fails) are retried as
+    single-document calls. Must be used from one event loop.
+    """
+
+    def __init__(self, model, executor, max_docs=4, max_tokens=30000, max_wait=2.0):
+        self.model = model
+        self.executor = executor
+        self.max_docs = max(1, max_docs)
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait
+        self._pending = {}  # fields -> [(doc_id, text, future)]
+        self._pending_tokens = collections.Counter()
+        self._timers = {}
+        self._tasks = set()
+
+    async def analyze(self, doc_id, cleaned_text, fields=GEMINI_FIELDS):
+        """Return the analysis dict of one document, or None if unusable.
+        Raises GeminiError if Gemini could not be reached."""
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(cleaned_text)
+        if self._pending.get(fields) and self._pending_tokens[fields] + tokens > self.max_tokens:
+            self._flush(fields)
+        pending = self._pending.setdefault(fields, [])
+        taken = {pending_id for pending_id, _, _ in pending}
+        unique_id, n = str(doc_id), 1
+        while unique_id in taken:
+            n += 1
+            unique_id = f"{doc_id}-{n}"
+
+        future = loop.create_future()
+        pending.append((unique_id, cleaned_text, future))
+        self._pending_tokens[fields] += tokens
+        if len(pending) >= self.max_docs:
+            self._flush(fields)
+        elif fields not in self._timers:
+            self._timers[fields] = loop.call_later(self.max_wait, self._flush, fields)
+        return await future
+
+    def _flush(self, fields):
+        timer = self._timers.pop(fields, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(fields, [])
+        self._pending_tokens.pop(fields, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(batch, fields))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch, fields):
+        answers = {}
+        if len(batch) > 1:
+            doc_ids = [doc_id for doc_id, _, _ in batch]
+            prompt = gemini_batch_prompt(fields) + "".join(
+                f"\n=== DOCUMENT {doc_id} ===\n{text}\n" for doc_id, text, _ in batch
+            )
+            print(f"Sending {len(batch)} documents to Gemini in one request")
+            try:
+                response_text = await self.executor.generate(
+                    self.model, prompt, self.executor.deadline_seconds * min(len(batch), 3)
+                )
+                answers = decode_gemini_batch(response_text, doc_ids)
+            except GeminiError as e:
+                print(f"Gemini batch failed ({e}), falling back to single documents")
+            missing = len(batch) - len(answers)
+            if missing:
+                print(f"{missing} of {len(batch)} documents not answered by the batch, sending them alone")
+
+        await asyncio.gather(*(
+            self._answer(doc_id, text, future, answers, fields) for doc_id, text, future in batch
+        ))
+
+    async def _answer(self, doc_id, text, future, answers, fields):
+        if future.done():
+            return
+        if doc_id in answers:
+            future.set_result(answers[doc_id])
+            return
+        try:
+            response_text = await self.executor.generate(self.model, gemini_prompt(fields) + "\n" + text)
+            result = decode_gemini_analysis(response_text)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def cancel(self):
+        """Drop queued documents and stop running batches, e.g. when the scrape ends"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for pending in self._pending.values():
+            for _, _, future in pending:
+                future.cancel()
+        self._pending.clear()
+        self._pending_tokens.clear()
+        for task in list(self._tasks):
+            task.cancel()
+
+
+def new_gemini_batcher(model):
+    """Return a GeminiBatcher for one scrape, or None when batching is disabled
+    (GEMINI_BATCH_SIZE=1) or there is no model"""
+    max_docs = int(config.get("GEMINI_BATCH_SIZE") or 4)
+    if not model or max_docs <= 1:
+        return None
+    return GeminiBatcher(
+        model,
+        gemini_executor,
+        max_docs=max_docs,
+        max_tokens=int(config.get("GEMINI_BATCH_MAX_TOKENS") or 30000),
+        max_wait=float(config.get("GEMINI_BATCH_WAIT_SECONDS") or 2),
+    )
+
+
+gemini_executor = GeminiExecutor(
+    concurrency=int(config.get("GEMINI_CONCURRENCY") or 4),
+    rpm=int(config.get("GEMINI_RPM") or 60),
+    tpm=int(config.get("GEMINI_TPM") or 1_000_000),
+    max_retries=int(config.get("GEMINI_MAX_RETRIES") or 4),
+    deadline_seconds=float(config.get("GEMINI_DEADLINE_SECONDS") or 60),
+)
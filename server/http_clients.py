@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import dotenv_values
+
+config = dotenv_values()  # Load .env file into a dictionary
+
+# Connections per client, keep-alive connections kept open per client and how
+# long an idle one is kept. Connections are pooled per host.
+HTTP_MAX_CONNECTIONS = int(config.get("HTTP_MAX_CONNECTIONS") or 32)
+HTTP_MAX_KEEPALIVE = int(config.get("HTTP_MAX_KEEPALIVE") or 16)
+HTTP_KEEPALIVE_SECONDS = float(config.get("HTTP_KEEPALIVE_SECONDS") or 30)
+HTTP_TIMEOUT = 30
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the keep-alive httpx client shared by every scrape on the running
+    event loop, so pages and PDFs reuse open connections across scrapes"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the running loop's shared client; call before a private loop ends"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide requests session used from plain threads"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_MAX_KEEPALIVE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
@@ -0,0 +1,119 @@
+from selectolax.lexbor import LexborHTMLParser
+import re
+from rate_control import rate_controller
+from scraper import get_random_user_agent
+
+# Text that shows up on bot-protection / captcha interstitials instead of the
+# real eauction.gr markup
+CHALLENGE_MARKERS = (
+    "cf-browser-verification",
+    "challenge-platform",
+    "cf-chl-",
+    "just a moment...",
+    "attention required! | cloudflare",
+    "/cdn-cgi/challenge",
+)
+CHALLENGE_STATUS_CODES = (403, 429, 503)
+
+HTML_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "el-GR,el;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+
+
+class NeedsBrowser(Exception):
+    """The page cannot be read over plain HTTP; use the Playwright path"""
+
+
+def _text(node, selector):
+    """innerText-like text of the first match below node, or None"""
+    match = node.css_first(selector)
+    if match is None:
+        return None
+    return match.text(separator="\n", strip=True)
+
+
+def looks_like_challenge(status_code, html):
+    """True if a response is a block or challenge page rather than content"""
+    if status_code in CHALLENGE_STATUS_CODES:
+        return True
+    head = html[:20000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+async def fetch_html(http_client, url, headers=None):
+    """GET a server-rendered page under the eauction.gr rate limit; headers
+    override the default ones. Raises NeedsBrowser on challenges or errors."""
+    headers = {**HTML_HEADERS, "User-Agent": get_random_user_agent(), **(headers or {})}
+    try:
+        async with rate_controller.request("eauction") as outcome:
+            response = await http_client.get(url, headers=headers)
+            html = response.text
+            if looks_like_challenge(response.status_code, html):
+                outcome.mark_challenge()
+            elif response.status_code >= 400:
+                outcome.mark_failed()
+    except Exception as e:
+        raise NeedsBrowser(f"HTTP fetch failed: {e}")
+    if looks_like_challenge(response.status_code, html):
+        raise NeedsBrowser(f"challenge or block page (HTTP {response.status_code})")
+    if response.status_code >= 400:
+        raise NeedsBrowser(f"HTTP {response.status_code}")
+    return html
+
+
+def parse_listing_html(html):
+    """Return (total_results, raw_cards) from listing page HTML.
+
+    raw_cards have the same keys as async_scraper.LISTING_CARDS_SCRIPT.
+    Raises NeedsBrowser when neither the result count nor any card is present,
+    which means the list is rendered client-side.
+    """
+    tree = LexborHTMLParser(html)
+    total_text = _text(tree, ".AuctionsListSearchOrderingTbl .AuctionsList-resultstxt")
+    cards = tree.css("div.AList-BoxContainer")
+    if total_text is None and not cards:
+        raise NeedsBrowser("listing markup not found in HTML")
+
+    total_results = 0
+    if total_text:
+        match = re.search(r"\d+", total_text)
+        total_results = int(match.group()) if match else 0
+
+    raw_cards = []
+    for card in cards:
+        footer = [
+            node.text(separator="\n", strip=True)
+            for node in card.css("div.AList-BoxFooter .AList-BoxFooterLeft .AList-BoxTextBlue500")
+        ]
+        link = card.css_first("a")
+        raw_cards.append({
+            "date": _text(card, "div.AList-BoxMainCell2 .DateIcon"),
+            "debtor": _text(card, "div.AList-BoxMainCell3 .AList-BoxTextBlueBold"),
+            "kind": _text(card, "div.AList-BoxMainCell4 .AList-BoxTextBlueBold"),
+            "location": _text(card, "div.AList-BoxMainCell4 .AList-BoxTextBlue"),
+            "price": _text(card, "div.AList-Boxheader .AList-BoxheaderRight .AList-BoxTextPrice"),
+            "status": _text(card, "div.AList-Boxheader .AList-BoxheaderLeft .AList-BoxTextBlueBold"),
+            "post_date": footer[0] if len(footer) > 0 else None,
+            "code": footer[1] if len(footer) > 1 else None,
+            "part_label": _text(card, "div.AList-BoxFooter .AList-BoxFooterLeft b"),
+            "href": link.attributes.get("href") if link is not None else None,
+        })
+    return total_results, raw_cards
+
+
+def parse_detail_pdf_anchors(html):
+    """Return [(href, title)] of the PDF download links on a detail page.
+    Raises NeedsBrowser if the page does not look like an auction detail page."""
+    tree = LexborHTMLParser(html)
+    anchors = tree.css(
+        "div.AuctionDetailsPDFItem .AuctionDetailsPDFtext .DownloadAuctionFile"
+    )
+    if not anchors and tree.css_first("div.AuctionDetailsPDFItem") is None:
+        # No PDF block at all: the auction may have no files, but the block may
+        # also be rendered by JavaScript, so let the browser decide
+        raise NeedsBrowser("no PDF section in HTML")
+    return [
+        (anchor.attributes.get("href"), anchor.attributes.get("title"))
+        for anchor in anchors
+    ]
@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import atexit
+import threading
+import uuid
+from scraper import (
+    build_scrape_summary_message,
+    config,
+    scrape_auctions,
+    send_telegram_notification,
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class ScrapeJob:
+    """One scrape_auctions run submitted through the job API.
+
+    Finished auctions are appended as they arrive (completion order) so that
+    clients can poll partial results with an offset; ordered_results()
+    returns them in listing order.
+    """
+
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = JOB_QUEUED
+        self.total_results = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._items = []  # (index, result_item) in completion order
+        self._lock = threading.Lock()
+
+    def add_result(self, index, item):
+        with self._lock:
+            self._items.append((index, item))
+
+    def add_missing_results(self, results):
+        """Append items of the final output that were never streamed (e.g. page errors)"""
+        with self._lock:
+            seen = {id(item) for _, item in self._items}
+            for index, item in enumerate(results):
+                if id(item) not in seen:
+                    self._items.append((index, item))
+
+    def results_since(self, offset):
+        """Return results in completion order starting at offset"""
+        with self._lock:
+            return [item for _, item in self._items[offset:]]
+
+    def ordered_results(self):
+        with self._lock:
+            return [item for _, item in sorted(self._items, key=lambda pair: pair[0])]
+
+    @property
+    def result_count(self):
+        with self._lock:
+            return len(self._items)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "result_count": self.result_count,
+            "total_results": self.total_results,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    """Runs scrape jobs on a bounded worker pool and keeps recent job history"""
+
+    def __init__(self, max_workers=2, history_limit=100):
+        self.history_limit = history_limit
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="scrape-job"
+        )
+        self._jobs = {}  # insertion ordered: oldest first
+        self._lock = threading.Lock()
+
+    def submit(self, params):
+        """Queue a scrape with scrape_auctions keyword arguments and return the job"""
+        job = ScrapeJob(params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job)
+        print(f"Queued scrape job {job.id}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Return jobs newest first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job. Returns the job, or None if unknown."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in FINISHED_STATES:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started
+            job.status = JOB_CANCELLED
+            job.finished_at = datetime.now()
+        print(f"Cancellation requested for job {job.id}")
+        return job
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond history_limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[: max(0, len(self._jobs) - self.history_limit)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.status = JOB_CANCELLED
+            job.finished_at = datetime.now()
+            return
+        job.status = JOB_RUNNING
+        job.started_at = datetime.now()
+        print(f"Starting scrape job {job.id}")
+        try:
+            output = scrape_auctions(
+                **job.params,
+                on_result=job.add_result,
+                cancel_event=job.cancel_event,
+            )
+            job.total_results = output.get("total_results")
+            job.add_missing_results(output.get("results", []))
+            job.finished_at = datetime.now()
+            if output.get("cancelled") or job.cancel_event.is_set():
+                job.status = JOB_CANCELLED
+            elif "error" in output:
+                job.error = output["error"]
+                job.status = JOB_FAILED
+            else:
+                job.status = JOB_COMPLETED
+                send_telegram_notification(build_scrape_summary_message(job.ordered_results()))
+        except Exception as e:
+            print(f"Scrape job {job.id} failed: {e}")
+            job.error = str(e)
+            job.finished_at = datetime.now()
+            job.status = JOB_FAILED
+        finally:
+            print(f"Scrape job {job.id} finished with status {job.status}")
+
+    def shutdown(self):
+        """Cancel every job, running or queued, without waiting for them"""
+        for job in self.list():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_manager = JobManager(
+    max_workers=int(config.get("JOB_WORKERS") or 2),
+    history_limit=int(config.get("JOB_HISTORY_LIMIT") or 100),
+)
+# Cancel running scrapes when the server exits. An atexit hook only runs after
+# the interpreter has waited for the job threads to finish, so CPython's
+# threading exit hook (the one ThreadPoolExecutor uses, run before that wait)
+# is preferred. It is not a public API; where it is missing, exit waits for
+# the jobs as before.
+getattr(threading, "_register_atexit", atexit.register)(job_manager.shutdown)
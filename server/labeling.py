@@ -0,0 +1,176 @@
+import time
+import numpy as np
+from records import AuctionRecord
+from scraper import config
+
+# Threshold name -> (setting, default). The rules they feed:
+#   Incomplete     no PDF, or no property area
+#   Πτώχευση       the PDF mentions a bankruptcy
+#   Expensive      price per m² above expensive_price_per_sqm
+#   Καλή Ευκαιρία  price per m² below opportunity_price_per_sqm, area above
+#                  opportunity_min_area, auction within opportunity_days
+#   Hot            Καλή Ευκαιρία with a property description
+#   Προσοχή        price below caution_price, and mortgages/encumbrances in
+#                  the notes or Incomplete
+THRESHOLD_SETTINGS = {
+    "expensive_price_per_sqm": ("LABEL_EXPENSIVE_PRICE_PER_SQM", 1500),
+    "opportunity_price_per_sqm": ("LABEL_OPPORTUNITY_PRICE_PER_SQM", 600),
+    "opportunity_min_area": ("LABEL_OPPORTUNITY_MIN_AREA", 70),
+    "opportunity_days": ("LABEL_OPPORTUNITY_DAYS", 21),
+    "caution_price": ("LABEL_CAUTION_PRICE", 50000),
+}
+LABEL_THRESHOLDS = {
+    name: float(config.get(setting) or default)
+    for name, (setting, default) in THRESHOLD_SETTINGS.items()
+}
+# In the order they appear in ai_labels
+LABELS = ("Incomplete", "Πτώχευση", "Expensive", "Καλή Ευκαιρία", "Hot", "Προσοχή")
+SIMPLE_TAGS = ("N/A", "Incomplete", "Expensive", "Opportunity")
+RISK_TERMS = ("υποθήκη", "βάρη")
+
+
+def thresholds_with(overrides=None):
+    """LABEL_THRESHOLDS with some values replaced. Raises ValueError for
+    unknown names and values that are not numbers."""
+    thresholds = dict(LABEL_THRESHOLDS)
+    for name, value in (overrides or {}).items():
+        if name not in thresholds:
+            raise ValueError(f"Unknown threshold {name}. Use one of: {', '.join(thresholds)}")
+        try:
+            thresholds[name] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {name}: {value}")
+    return thresholds
+
+
+class LabelColumns:
+    """The inputs of the labeling rules for many AuctionRecords, one NumPy
+    array per field (NaN where a value is missing).
+
+    Built once per set of records, so they can be labeled again under other
+    thresholds without reading the records again.
+    """
+
+    def __init__(self, records):
+        nan = float("nan")
+
+        def column(values, dtype=float):
+            return np.fromiter(values, dtype=dtype, count=len(records))
+
+        def number(value):
+            return nan if value is None else value
+
+        self.size = len(records)
+        self.has_pdf = column((bool(r.pdf_href) for r in records), bool)
+        self.area = column(number(r.property_area) for r in records)
+        self.price = column(number(r.price_value) for r in records)
+        self.price_per_sqm = column(number(r.price_per_sqm_value) for r in records)
+        self.conduct_time = column(
+            r.conduct_date.timestamp() if r.conduct_date else nan for r in records
+        )
+        self.is_bankruptcy = column((bool(r.is_bankruptcy) for r in records), bool)
+        self.has_description = column(
+            (r.property_description not in ("N/A", "", None) for r in records), bool
+        )
+        self.has_risks = column(
+            (
+                isinstance(r.notes, str) and any(term in r.notes for term in RISK_TERMS)
+                for r in records
+            ),
+            bool,
+        )
+
+    def label(self, thresholds=None, now=None):
+        """Evaluate the rules for every item at once.
+        Returns ({label: boolean mask}, simple_tags as an array of strings)."""
+        t = thresholds or LABEL_THRESHOLDS
+        now = time.time() if now is None else now
+        # NaN compares False, so missing values never match a rule
+        with np.errstate(invalid="ignore"):
+            incomplete = ~self.has_pdf | ~(self.area > 0)
+            until_auction = self.conduct_time - now
+            # Counted in whole days, like (auction_date - now).days
+            soon = (until_auction >= 0) & (until_auction < (t["opportunity_days"] + 1) * 86400)
+            expensive = self.price_per_sqm > t["expensive_price_per_sqm"]
+            opportunity = (
+                (self.price_per_sqm > 0)
+                & (self.price_per_sqm < t["opportunity_price_per_sqm"])
+                & (self.area > t["opportunity_min_area"])
+                & soon
+            )
+            caution = (
+                (self.price > 0)
+                & (self.price < t["caution_price"])
+                & (self.has_risks | incomplete)
+            )
+        masks = {
+            "Incomplete": incomplete,
+            "Πτώχευση": self.is_bankruptcy,
+            "Expensive": expensive,
+            "Καλή Ευκαιρία": opportunity,
+            "Hot": opportunity & self.has_description,
+            "Προσοχή": caution,
+        }
+        # The later rules win, as they overwrite the tag one after another
+        simple_tags = np.select(
+            [opportunity, expensive, incomplete], ["Opportunity", "Expensive", "Incomplete"], "N/A"
+        )
+        return masks, simple_tags
+
+    def counts(self, thresholds=None, now=None):
+        """Number of items per label and per simple_tag"""
+        masks, simple_tags = self.label(thresholds, now)
+        return (
+            {label: int(mask.sum()) for label, mask in masks.items()},
+            {tag: int((simple_tags == tag).sum()) for tag in SIMPLE_TAGS},
+        )
+
+
+def label_items(records, thresholds=None, now=None):
+    """Set ai_labels and simple_tag of every AuctionRecord; returns records"""
+    if not records:
+        return records
+    masks, simple_tags = LabelColumns(records).label(thresholds, now)
+    # Record i gets every label whose mask has i set, in LABELS order
+    matrix = np.column_stack([masks[label] for label in LABELS])
+    for record, row, simple_tag in zip(records, matrix, simple_tags.tolist()):
+        record.ai_labels = tuple(label for label, matched in zip(LABELS, row) if matched)
+        record.simple_tag = simple_tag
+    return records
+
+
+def preview_counts(records, thresholds, now=None):
+    """How the counts per label and simple_tag change from the configured
+    thresholds to the given ones"""
+    columns = LabelColumns(records)
+    now = time.time() if now is None else now
+    current_labels, current_tags = columns.counts(LABEL_THRESHOLDS, now)
+    preview_labels, preview_tags = columns.counts(thresholds, now)
+
+    def compare(current, preview):
+        return {
+            name: {"current": current[name], "preview": preview[name], "change": preview[name] - current[name]}
+            for name in current
+        }
+
+    return {
+        "total": columns.size,
+        "thresholds": thresholds,
+        "labels": compare(current_labels, preview_labels),
+        "simple_tags": compare(current_tags, preview_tags),
+    }
+
+
+def relabel_results(store, thresholds=None):
+    """Label every stored result again in one pass. Returns the number of
+    results whose labels changed."""
+    rows = store.all_items()
+    records = label_items([AuctionRecord.from_dict(item) for _, item in rows], thresholds)
+    changed = []
+    for (result_id, item), record in zip(rows, records):
+        labels = list(record.ai_labels)
+        if (labels, record.simple_tag) != (item.get("ai_labels"), item.get("simple_tag")):
+            item["ai_labels"], item["simple_tag"] = labels, record.simple_tag
+            changed.append((result_id, item))
+    store.update_labels(changed)
+    return len(changed)
@@ -0,0 +1,208 @@
+import asyncio
+import collections
+import concurrent.futures
+import io
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import PyPDF2
+from dotenv import dotenv_values
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+config = dotenv_values()  # Load .env file into a dictionary
+
+
+# Extracted text of a PDF. page_offsets[i] is where page i+1 starts in text;
+# complete is False when extraction stopped early at a page or character budget.
+PdfText = collections.namedtuple("PdfText", ["text", "page_offsets", "complete"])
+
+
+class PdfExtractionError(Exception):
+    """A PDF could not be parsed within its limits, or its worker died"""
+
+
+# A BaseException, so PyPDF2's many "except Exception" blocks cannot swallow it
+class _CpuTimeExceeded(BaseException):
+    pass
+
+
+# Extra CPU seconds after which RLIMIT_CPU kills a worker that keeps parsing
+# past its limit anyway
+CPU_KILL_GRACE_SECONDS = 5
+
+
+_timer_armed = False
+
+
+def _raise_cpu_time_exceeded(signum, frame):
+    # A signal delivered while the timer is being disarmed is ignored
+    if _timer_armed:
+        raise _CpuTimeExceeded()
+
+
+def _pool_context():
+    """forkserver (spawn on Windows) for the worker processes. Forking the
+    server would copy locks held by its other threads (event loops, job
+    threads, SQLite and HTTP clients) into a worker, where nothing releases
+    them."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _useful_chars(page_text):
+    """Length of page_text once blank lines and indentation are dropped, which
+    is what the analysis gets to read (see clean_pdf_text)"""
+    return sum(len(line.strip()) + 1 for line in page_text.splitlines() if line.strip())
+
+
+def extract_pdf_text(content, max_pages=None, max_chars=None):
+    """Extract the text of a PDF page by page, stopping after max_pages pages
+    or once max_chars characters of non-blank text are collected.
+    Returns a PdfText."""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(content) if isinstance(content, bytes) else content)
+    page_count = len(pdf_reader.pages)
+
+    parts, page_offsets = [], []
+    offset = useful = 0
+    for page in pdf_reader.pages:
+        if (max_pages and len(parts) >= max_pages) or (max_chars and useful >= max_chars):
+            break
+        page_text = page.extract_text().strip()
+        page_offsets.append(offset)
+        parts.append(page_text)
+        offset += len(page_text) + 1
+        useful += _useful_chars(page_text)
+
+    if len(parts) < page_count:
+        print(f"Stopped PDF extraction after {len(parts)} of {page_count} pages")
+    return PdfText("\n".join(parts), page_offsets, len(parts) == page_count)
+
+
+def _extract_file(path, max_pages, max_chars, cpu_seconds):
+    """Worker side: parse the PDF file at path.
+
+    ITIMER_PROF counts this process's CPU time, so the limit applies to this
+    document only and time spent waiting for work does not count. The timer
+    fires again every CPU second in case the exception is caught somewhere
+    inside PyPDF2, and RLIMIT_CPU kills the worker CPU_KILL_GRACE_SECONDS
+    later if the document still will not stop (see PdfExtractor.extract_file).
+    """
+    global _timer_armed
+    timed = cpu_seconds and hasattr(signal, "setitimer")
+    limited = cpu_seconds and resource is not None
+    try:
+        if limited:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = usage.ru_utime + usage.ru_stime
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(used + cpu_seconds + CPU_KILL_GRACE_SECONDS) + 1
+            if hard == resource.RLIM_INFINITY or soft < hard:
+                resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+            else:
+                limited = False
+        try:
+            if timed:
+                signal.signal(signal.SIGPROF, _raise_cpu_time_exceeded)
+                _timer_armed = True
+                signal.setitimer(signal.ITIMER_PROF, cpu_seconds, 1)
+            with open(path, "rb") as f:
+                return extract_pdf_text(f, max_pages, max_chars)
+        finally:
+            _timer_armed = False
+            if timed:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+    except _CpuTimeExceeded:
+        raise PdfExtractionError(f"PDF parsing took more than {cpu_seconds}s of CPU time")
+    finally:
+        if limited:
+            resource.setrlimit(resource.RLIMIT_CPU, (resource.RLIM_INFINITY, hard))
+
+
+class PdfExtractor:
+    """Process pool that turns PDF bytes into text for every scrape in the process.
+
+    PyPDF2 is pure Python, so parsing in threads holds the GIL and competes
+    with the event loops; here each document is parsed in one of ``workers``
+    processes. The bytes are written once to a temporary file that the worker
+    reads from instead of being pickled through the pool's pipe.
+    A document may use at most cpu_seconds of CPU time and max_pages pages;
+    callers that only read the beginning of a document also pass max_chars.
+    """
+
+    def __init__(self, workers, max_pages=50, cpu_seconds=30):
+        self.workers = max(1, workers)
+        self.max_pages = max_pages
+        self.cpu_seconds = cpu_seconds
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_pool_context()
+                )
+            return self._pool
+
+    def _reset_pool(self, pool):
+        """Replace a pool whose worker died (e.g. killed for memory)"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def extract(self, content, max_chars=None):
+        """Return the PdfText of a PDF given as bytes. Raises PdfExtractionError."""
+        if not content:
+            raise PdfExtractionError("Empty PDF")
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            return await self.extract_file(path, max_chars)
+        finally:
+            os.remove(path)
+
+    async def extract_file(self, path, max_chars=None):
+        """Return the PdfText of the PDF file at path. Raises PdfExtractionError.
+
+        A worker that dies (killed by RLIMIT_CPU or for memory) breaks the
+        whole pool and every document in it. Those documents are parsed
+        again, each in a process of its own, so only the one that killed
+        the worker fails.
+        """
+        pool = self._get_pool()
+        args = (_extract_file, path, self.max_pages, max_chars, self.cpu_seconds)
+        try:
+            return await asyncio.wrap_future(pool.submit(*args))
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+        print(f"PDF worker process died, parsing {path} again on its own")
+        alone = concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=_pool_context())
+        try:
+            return await asyncio.wrap_future(alone.submit(*args))
+        except BrokenProcessPool:
+            raise PdfExtractionError("PDF worker process died")
+        finally:
+            alone.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+pdf_extractor = PdfExtractor(
+    workers=int(config.get("PDF_EXTRACT_WORKERS") or os.cpu_count() or 1),
+    max_pages=int(config.get("PDF_MAX_PAGES") or 50),
+    cpu_seconds=float(config.get("PDF_CPU_SECONDS") or 30),
+)
@@ -0,0 +1,245 @@
+import itertools
+import os
+import shutil
+import threading
+import time
+from cache import CACHE_DIR, _SqliteStore, config, content_hash
+
+PDF_STORE_DIR = os.path.join(CACHE_DIR, "pdfs")
+
+
+class PdfStore(_SqliteStore):
+    """Downloaded PDFs on disk, stored once per content hash.
+
+    Each file lives at <root>/<hash[:2]>/<hash>.pdf, and an index maps every
+    URL to the hash it served last, together with the ETag and Last-Modified
+    headers of that response. A URL checked within ``ttl_seconds`` is served
+    from disk without a request; older ones are revalidated with a
+    conditional GET (see conditional_headers). When the files grow past
+    ``max_bytes`` the least recently used are deleted.
+    """
+
+    def __init__(self, root, max_bytes, ttl_seconds):
+        super().__init__(os.path.join(root, "index.sqlite3"))
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._checkouts = itertools.count()
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pdf_blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pdf_blobs_accessed
+                    ON pdf_blobs (accessed_at);
+                CREATE TABLE IF NOT EXISTS pdf_sources (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    validated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pdf_sources_hash
+                    ON pdf_sources (content_hash);
+                """
+            )
+
+    def file_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest + ".pdf")
+
+    def checkout(self, digest):
+        """Return a private path to a stored document that stays readable
+        after the store evicts it (a hard link, or a copy where links are not
+        supported). Hand it back with release() once read."""
+        path = self.file_path(digest)
+        private = f"{path}.{os.getpid()}.{next(self._checkouts)}.pin"
+        try:
+            os.link(path, private)
+        except OSError:
+            if not os.path.exists(path):
+                raise
+            shutil.copyfile(path, private)
+        return private
+
+    def release(self, private):
+        try:
+            os.remove(private)
+        except FileNotFoundError:
+            pass
+
+    def lookup(self, url):
+        """Return the stored entry of a URL as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, etag, last_modified, validated_at FROM pdf_sources "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if not row or not os.path.exists(self.file_path(row[0])):
+            return None
+        return {
+            "content_hash": row[0],
+            "etag": row[1],
+            "last_modified": row[2],
+            "validated_at": row[3],
+        }
+
+    def is_fresh(self, entry):
+        return entry["validated_at"] >= time.time() - self.ttl_seconds
+
+    def conditional_headers(self, entry):
+        """If-None-Match / If-Modified-Since headers to revalidate an entry"""
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def use(self, url, digest, revalidated=False):
+        """Mark a stored document as used, and its URL as revalidated"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pdf_blobs SET accessed_at = ? WHERE content_hash = ?", (now, digest)
+            )
+            if revalidated:
+                self._conn.execute(
+                    "UPDATE pdf_sources SET validated_at = ? WHERE url = ?", (now, url)
+                )
+
+    def put(self, url, content, etag=None, last_modified=None):
+        """Store a downloaded PDF (unless its content is already stored) and
+        point url at it. Returns the content hash."""
+        digest = content_hash(content)
+        path = self.file_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_blobs (content_hash, size, accessed_at) "
+                "VALUES (?, ?, ?)",
+                (digest, len(content), now),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_sources "
+                "(url, content_hash, etag, last_modified, validated_at) VALUES (?, ?, ?, ?, ?)",
+                (url, digest, etag, last_modified, now),
+            )
+            self._evict(self.max_bytes, keep=digest)
+        return digest
+
+    def _evict(self, max_bytes, keep=None):
+        """Delete least recently used files until the store fits in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pdf_blobs").fetchone()[0]
+        removed = 0
+        if total <= max_bytes:
+            return removed
+        rows = self._conn.execute(
+            "SELECT content_hash, size FROM pdf_blobs ORDER BY accessed_at ASC"
+        ).fetchall()
+        for digest, size in rows:
+            if total <= max_bytes:
+                break
+            if digest == keep:
+                continue
+            self._delete(digest)
+            total -= size
+            removed += 1
+        return removed
+
+    def _delete(self, digest):
+        self._conn.execute("DELETE FROM pdf_blobs WHERE content_hash = ?", (digest,))
+        self._conn.execute("DELETE FROM pdf_sources WHERE content_hash = ?", (digest,))
+        try:
+            os.remove(self.file_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, max_bytes=None, unused_seconds=None):
+        """Delete documents unused for unused_seconds, then the least recently
+        used until the store fits in max_bytes (default: its size cap), and
+        files the index does not know about. Returns the number removed."""
+        removed = 0
+        with self._lock, self._conn:
+            if unused_seconds is not None:
+                for (digest,) in self._conn.execute(
+                    "SELECT content_hash FROM pdf_blobs WHERE accessed_at < ?",
+                    (time.time() - unused_seconds,),
+                ).fetchall():
+                    self._delete(digest)
+                    removed += 1
+            removed += self._evict(self.max_bytes if max_bytes is None else max_bytes)
+            known = {row[0] for row in self._conn.execute("SELECT content_hash FROM pdf_blobs")}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                orphan = filename.endswith(".pdf") and filename[:-4] not in known
+                # Temporary files of downloads that died half-way, and
+                # checkouts never released (e.g. a cancelled scrape)
+                stale = (
+                    filename.endswith((".tmp", ".pin"))
+                    and os.path.getmtime(path) < time.time() - 3600
+                )
+                if orphan or stale:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pdf_blobs"
+            ).fetchone()
+            urls = self._conn.execute("SELECT COUNT(*) FROM pdf_sources").fetchone()[0]
+        return {"documents": count, "bytes": size, "urls": urls, "max_bytes": self.max_bytes}
+
+
+_pdf_store = None
+_pdf_store_lock = threading.Lock()
+
+
+def get_pdf_store():
+    """Return the process-wide PDF store, or None if disabled"""
+    global _pdf_store
+    if config.get("PDF_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _pdf_store_lock:
+        if _pdf_store is None:
+            _pdf_store = PdfStore(
+                PDF_STORE_DIR,
+                max_bytes=int(float(config.get("PDF_STORE_MAX_MB") or 1024) * 1024 * 1024),
+                ttl_seconds=float(config.get("PDF_STORE_TTL_HOURS") or 24) * 3600,
+            )
+        return _pdf_store
+
+
+if __name__ == "__main__":
+    # python pdf_store.py stats
+    # python pdf_store.py prune [--max-mb N] [--unused-days N]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or prune the on-disk PDF store")
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--max-mb", type=float, help="shrink the store to this size")
+    parser.add_argument("--unused-days", type=float, help="drop documents unused for this long")
+    args = parser.parse_args()
+
+    store = get_pdf_store()
+    if store is None:
+        raise SystemExit("The PDF store is disabled (PDF_STORE_ENABLED=false)")
+    if args.command == "prune":
+        removed = store.prune(
+            max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None,
+            unused_seconds=args.unused_days * 86400 if args.unused_days is not None else None,
+        )
+        print(f"Removed {removed} files")
+    print(store.stats())
@@ -0,0 +1,62 @@
+import asyncio
+
+
+class Stage:
+    """One stage of a scrape pipeline: a bounded queue drained by workers.
+
+    put() waits while the queue is full, which is how a slow stage pushes
+    back on the stage feeding it. handler(item) is awaited for every item and
+    hands the item on to the next stage itself; if it raises,
+    on_error(item, exc) is awaited instead so the item is never lost.
+    """
+
+    def __init__(self, name, handler, concurrency, on_error, queue_size=None):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.on_error = on_error
+        self.queue = asyncio.Queue(maxsize=queue_size or 2 * self.concurrency)
+        self.busy = 0
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._workers = []
+
+    async def put(self, item):
+        await self.queue.put(item)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._workers = [loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            self.busy += 1
+            start = loop.time()
+            try:
+                await self.handler(item)
+            except Exception as e:
+                try:
+                    await self.on_error(item, e)
+                except Exception as handler_error:
+                    print(f"Error handling failure in stage {self.name}: {handler_error}")
+            finally:
+                self.busy -= 1
+                self.processed += 1
+                self.busy_seconds += loop.time() - start
+                self.queue.task_done()
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def snapshot(self):
+        return {
+            "concurrency": self.concurrency,
+            "queued": self.queue.qsize(),
+            "busy": self.busy,
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 2),
+        }
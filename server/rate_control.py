@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import threading
+import time
+from dotenv import dotenv_values
+
+config = dotenv_values()  # Load .env file into a dictionary
+
+# host -> (start, min, max requests per second, seconds after which a response
+# counts as slow). Override with e.g. RATE_LIMIT_EAUCTION=0.5,0.1,4,5
+DEFAULT_RATE_LIMITS = {
+    "eauction": (0.5, 0.1, 4.0, 5.0),  # listing and detail pages
+    "pdf": (1.0, 0.2, 4.0, 10.0),  # PDF downloads
+    "gemini": (1.0, 0.1, 5.0, 30.0),
+    "telegram": (0.5, 0.05, 1.0, 5.0),
+}
+
+
+class HostRateLimiter:
+    """Token bucket for one host whose refill rate follows AIMD.
+
+    Every healthy response adds ``increase`` requests per second, up to
+    max_rate. A failure, challenge page or response slower than slow_seconds
+    multiplies the rate by ``decrease`` (down to min_rate) and drains the
+    bucket, at most once per refill interval so that a burst of concurrent
+    failures counts as one. Safe to share between threads and event loops.
+    """
+
+    def __init__(self, name, rate, min_rate, max_rate, slow_seconds, burst=2,
+                 increase=0.05, decrease=0.5):
+        self.name = name
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.slow_seconds = slow_seconds
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "slow": 0, "failed": 0, "challenges": 0}
+        self.last_latency = None
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            self.stats["requests"] += 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def record(self, latency, failed=False, challenge=False):
+        """Adjust the rate after a response that took latency seconds"""
+        with self._lock:
+            self.last_latency = latency
+            slow = latency > self.slow_seconds
+            if challenge:
+                self.stats["challenges"] += 1
+            elif failed:
+                self.stats["failed"] += 1
+            elif slow:
+                self.stats["slow"] += 1
+            else:
+                self.stats["ok"] += 1
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                return
+
+            now = time.monotonic()
+            if now - self._last_decrease < 1 / self.rate:
+                return
+            self._last_decrease = now
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            reason = "challenge" if challenge else "error" if failed else f"slow response ({latency:.1f}s)"
+        print(f"Rate for {self.name} lowered after {reason}: {old_rate:.2f} -> {self.rate:.2f} req/s")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "min_rate": self.min_rate,
+                "max_rate": self.max_rate,
+                "slow_seconds": self.slow_seconds,
+                "last_latency": round(self.last_latency, 3) if self.last_latency is not None else None,
+                **self.stats,
+            }
+
+
+class RequestOutcome:
+    """Handed to the body of RateController.request(); mark what went wrong"""
+
+    def __init__(self):
+        self.failed = False
+        self.challenge = False
+
+    def mark_failed(self):
+        self.failed = True
+
+    def mark_challenge(self):
+        self.challenge = True
+
+
+class RateController:
+    """Process-wide pacing of outgoing requests, one HostRateLimiter per host.
+
+    Wrap each request in ``async with rate_controller.request(host)`` (or
+    ``with rate_controller.request_sync(host)`` from plain threads): it waits
+    for a token, times the request and feeds the outcome back into the host's
+    rate. Exceptions raised by the body count as failures.
+    """
+
+    def __init__(self, limits):
+        self._limiters = {
+            name: HostRateLimiter(name, *values) for name, values in limits.items()
+        }
+
+    def get(self, host):
+        return self._limiters[host]
+
+    @contextlib.asynccontextmanager
+    async def request(self, host):
+        limiter = self._limiters[host]
+        await limiter.acquire()
+        outcome = RequestOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            limiter.record(time.monotonic() - start, failed=True)
+            raise
+        limiter.record(time.monotonic() - start, outcome.failed, outcome.challenge)
+
+    @contextlib.contextmanager
+    def request_sync(self, host):
+        limiter = self._limiters[host]
+        limiter.acquire_sync()
+        outcome = RequestOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            limiter.record(time.monotonic() - start, failed=True)
+            raise
+        limiter.record(time.monotonic() - start, outcome.failed, outcome.challenge)
+
+    def snapshot(self):
+        """Current rate and counters of every host"""
+        return {name: limiter.snapshot() for name, limiter in self._limiters.items()}
+
+
+def load_rate_limits():
+    """DEFAULT_RATE_LIMITS with RATE_LIMIT_<HOST> overrides from .env"""
+    limits = {}
+    for name, defaults in DEFAULT_RATE_LIMITS.items():
+        override = config.get(f"RATE_LIMIT_{name.upper()}")
+        values = list(defaults)
+        if override:
+            for i, value in enumerate(override.split(",")[: len(values)]):
+                if value.strip():
+                    values[i] = float(value)
+        limits[name] = tuple(values)
+    return limits
+
+
+rate_controller = RateController(load_rate_limits())
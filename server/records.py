@@ -0,0 +1,207 @@
+from datetime import datetime
+
+
+def parse_greek_number(number_str):
+    """Parse Greek-formatted numbers to float.
+    Greek format: 94.000,00 € (period for thousands, comma for decimal)
+    English format needs: 94000.00
+    """
+    if not number_str or number_str == "N/A":
+        return None
+
+    try:
+        # Clean the string
+        cleaned = str(number_str).strip()
+
+        # Remove currency symbols and extra spaces
+        cleaned = cleaned.replace("€", "").replace("EUR", "").replace("$", "").strip()
+
+        # Handle Greek number format
+        if "," in cleaned and "." in cleaned:
+            # Greek format: 94.000,50 (periods for thousands, comma for decimal)
+            parts = cleaned.split(",")
+            if len(parts) == 2:
+                # Replace periods in the integer part (thousands separators)
+                integer_part = parts[0].replace(".", "")
+                decimal_part = parts[1]
+                cleaned = f"{integer_part}.{decimal_part}"
+        elif "," in cleaned and "." not in cleaned:
+            # Only comma (decimal separator): 94,50
+            cleaned = cleaned.replace(",", ".")
+        elif "." in cleaned and "," not in cleaned:
+            # Check if it's thousands separator or decimal
+            parts = cleaned.split(".")
+            if len(parts) > 2:
+                # Multiple periods = thousands separators: 1.234.567
+                cleaned = cleaned.replace(".", "")
+            elif len(parts) == 2 and len(parts[1]) == 3:
+                # Likely thousands separator: 94.000
+                cleaned = cleaned.replace(".", "")
+            # If decimal part has 1-2 digits, keep as decimal: 94.5 or 94.50
+
+        return float(cleaned)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _number(value):
+    """A float from a number or a Greek-formatted string, else None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return parse_greek_number(value) if isinstance(value, str) else None
+
+
+def _conduct_date(value):
+    try:
+        return datetime.strptime(value, "%d/%m/%Y")
+    except (ValueError, TypeError):
+        return None
+
+
+# Fields of the PDF analysis kept on a record, in API order
+ANALYSIS_FIELDS = (
+    "property_area",
+    "starting_price",
+    "address",
+    "property_description",
+    "notes",
+    "occupancy_status",
+    "is_bankruptcy",
+    "property_type",
+    "analysis_source",
+    "analysis_error",
+)
+
+
+class AuctionRecord:
+    """One labeled auction.
+
+    Prices, area and price per m² are parsed to floats and the conduct date
+    to a datetime once, when the record is built; the labeling rules, the
+    results store and the Telegram summary read those. The listing's own
+    strings (price, date) are kept for display. to_dict() produces the
+    result_item JSON of the API, so only responses pay for formatting and
+    for the fields the API repeats (auction_object, filter_context).
+    """
+
+    __slots__ = (
+        "code", "part_number", "post_date", "status", "price", "price_value",
+        "date", "conduct_date", "debtor", "kind", "region", "municipality",
+        "detail_link", "pdf_href", "all_pdf_links", "ai_labels", "simple_tag",
+        "filter_context", "analyzed", "price_per_sqm_value", "extra",
+    ) + ANALYSIS_FIELDS
+
+    def __init__(self, card, pdf_href, all_pdf_links, pdf_analysis, filter_context):
+        self.code = card["code"]
+        self.part_number = card["part_label"]
+        self.post_date = card["post_date"]
+        self.status = card["status"]
+        self.price = card["price"]  # The starting price shown in the listing
+        self.price_value = _number(card["price"])
+        self.date = card["conduct_date"]
+        self.conduct_date = _conduct_date(card["conduct_date"])
+        self.debtor = card["debtor"]
+        self.kind = card["kind"]
+        self.region = card["region"]
+        self.municipality = card["municipality"]
+        self.detail_link = card["detail_link"]
+        self.pdf_href = pdf_href  # The PDF that was analyzed
+        self.all_pdf_links = tuple(all_pdf_links or ())
+        self.ai_labels = ()
+        self.simple_tag = "N/A"  # Both set by labeling.label_items
+        self.filter_context = filter_context  # Shared by every record of a scrape
+        self.set_analysis(pdf_analysis)
+
+    def set_analysis(self, pdf_analysis):
+        """Take the fields of a PDF analysis dict (Gemini and rules output)"""
+        self.analyzed = bool(pdf_analysis)
+        self.extra = None
+        for field in ANALYSIS_FIELDS:
+            setattr(self, field, None)
+        for key, value in (pdf_analysis or {}).items():
+            if key in ANALYSIS_FIELDS:
+                setattr(self, key, value)
+            elif key != "price_per_sqm":  # Derived below
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+        self.property_area = _number(self.property_area)
+        self.price_per_sqm_value = (
+            self.price_value / self.property_area
+            if self.price_value and self.property_area and self.property_area > 0
+            else None
+        )
+
+    @classmethod
+    def from_dict(cls, item):
+        """Rebuild a record from its to_dict() output (e.g. a stored result)"""
+        card = {key: item.get(key) for key in _CARD_FIELDS}
+        card.update(part_label=item.get("part_number"), conduct_date=item.get("date"))
+        record = cls(
+            card,
+            item.get("pdf_href"),
+            item.get("all_pdf_links"),
+            {key: value for key, value in item.items() if key not in _ITEM_FIELDS},
+            item.get("filter_context"),
+        )
+        record.ai_labels = tuple(item.get("ai_labels") or ())
+        record.simple_tag = item.get("simple_tag") or "N/A"
+        return record
+
+    @property
+    def price_per_sqm(self):
+        if self.price_per_sqm_value is None:
+            return "N/A"
+        return f"€{self.price_per_sqm_value:,.2f}"
+
+    def to_dict(self):
+        """The result_item dict the API returns for this auction"""
+        item = {
+            "code": self.code,
+            "part_number": self.part_number,
+            "post_date": self.post_date,
+            "auction_object": self.kind,
+            "status": self.status,
+            "price": self.price,
+            "date": self.date,
+            "debtor": self.debtor,
+            "kind": self.kind,  # Retaining for compatibility if needed elsewhere
+            "region": self.region,
+            "municipality": self.municipality,
+            "detail_link": self.detail_link,
+            "pdf_href": self.pdf_href,  # First PDF (for backward compatibility)
+            "all_pdf_links": list(self.all_pdf_links),  # All PDF links
+            "ai_labels": list(self.ai_labels),
+            "simple_tag": self.simple_tag,
+            # Add filter context for debugging
+            "filter_context": self.filter_context,
+        }
+        if self.analyzed:
+            # Every analysis field, null when unknown, like Gemini's JSON;
+            # analysis_error only appears on failures
+            for field in ANALYSIS_FIELDS:
+                value = getattr(self, field)
+                if value is not None or field != "analysis_error":
+                    item[field] = value
+            if self.extra:
+                item.update(self.extra)
+            item["price_per_sqm"] = self.price_per_sqm
+        return item
+
+
+_CARD_FIELDS = (
+    "code", "post_date", "status", "price", "debtor", "kind", "region", "municipality", "detail_link",
+)
+# Keys of to_dict() that are not part of the PDF analysis
+_ITEM_FIELDS = frozenset((
+    "code", "part_number", "post_date", "auction_object", "status", "price",
+    "date", "debtor", "kind", "region", "municipality", "detail_link",
+    "pdf_href", "all_pdf_links", "ai_labels", "simple_tag", "filter_context",
+))
+
+
+def json_default(value):
+    """json.dumps default= hook that writes AuctionRecords as their API dicts"""
+    if isinstance(value, AuctionRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
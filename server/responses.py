@@ -0,0 +1,97 @@
+import gzip
+import json
+from flask import Response, request
+from records import AuctionRecord, json_default
+
+try:
+    import orjson
+except ImportError:  # Optional: ~5x faster encoding
+    orjson = None
+try:
+    import brotli
+except ImportError:  # Optional: Content-Encoding: br
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+LAYOUTS = ("items", "columns")
+
+
+def encode_json(payload):
+    """Serialize payload (AuctionRecords included) to UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=json_default)
+    # Compact separators, like orjson
+    return json.dumps(
+        payload, ensure_ascii=False, separators=(",", ":"), default=json_default
+    ).encode("utf-8")
+
+
+def requested_fields(data=None):
+    """The fields projection of a request: ?fields=a,b or "fields" in the JSON
+    body (a list or a comma separated string). None means every field.
+    Raises ValueError for anything else."""
+    fields = request.args.get("fields") or (data or {}).get("fields")
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    if fields and not (isinstance(fields, list) and all(isinstance(field, str) for field in fields)):
+        raise ValueError("fields must be a list of field names or a comma separated string")
+    fields = [field.strip() for field in fields or () if field.strip()]
+    return fields or None
+
+
+def requested_layout(data=None):
+    """?layout= or "layout" in the JSON body: items (default) or columns.
+    Raises ValueError for anything else."""
+    layout = request.args.get("layout") or (data or {}).get("layout") or "items"
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout}. Use one of: {', '.join(LAYOUTS)}")
+    return layout
+
+
+def _item_dict(item, fields):
+    """The API dict of a result, reduced to fields. Error items are kept whole."""
+    item = item.to_dict() if isinstance(item, AuctionRecord) else item
+    if fields is None or "error" in item:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def shape_results(results, fields=None, layout="items"):
+    """Project results (AuctionRecords or dicts) to fields and lay them out.
+
+    "items" is the usual list of objects. "columns" writes every key once:
+    {"columns": [...], "rows": [[...], ...], "errors": [{"index": i, "error": ...}]},
+    with null where a row has no value for a column. Without fields the
+    columns are every key of the non-error items, in order of first appearance.
+    """
+    items = [_item_dict(item, fields) for item in results]
+    if layout == "items":
+        return items
+
+    columns = list(fields) if fields else list(
+        dict.fromkeys(key for item in items if "error" not in item for key in item)
+    )
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        if "error" in item:
+            errors.append({"index": index, "error": item["error"]})
+        else:
+            rows.append([item.get(column) for column in columns])
+    return {"columns": columns, "rows": rows, "errors": errors}
+
+
+def json_response(payload, status=200):
+    """A JSON response encoded with encode_json and compressed with brotli or
+    gzip when the client accepts it and the body is large enough"""
+    body = encode_json(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            body = brotli.compress(body, quality=5)
+            headers["Content-Encoding"] = "br"
+        elif accepted["gzip"]:
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(body, status=status, mimetype="application/json", headers=headers)
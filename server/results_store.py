@@ -0,0 +1,265 @@
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from cache import _SqliteStore, config
+from records import AuctionRecord
+
+RESULTS_DB_PATH = config.get("RESULTS_DB_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "scrape_results", "results.sqlite3"
+)
+
+# sort name -> indexed column
+SORT_COLUMNS = {
+    "date": "conduct_date",
+    "price": "price_value",
+    "price_per_sqm": "price_per_sqm_value",
+    "updated": "updated_at",
+}
+MAX_PAGE_SIZE = 500
+
+
+class InvalidQuery(ValueError):
+    """A /results query parameter could not be understood"""
+
+
+def parse_query_date(value):
+    """Accept dd/mm/YYYY (as used by the client) or YYYY-MM-DD and return ISO"""
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _encode_cursor(sort, value, row_id):
+    raw = json.dumps([sort, value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor, sort):
+    try:
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise InvalidQuery("Invalid cursor")
+    if cursor_sort != sort or not isinstance(row_id, int):
+        raise InvalidQuery("Cursor does not belong to this sort order")
+    return value, row_id
+
+
+class ResultsStore(_SqliteStore):
+    """Every result_item produced by a scrape, one row per auction.
+
+    Rows are keyed by auction code and detail link; scraping an auction again
+    replaces its stored item. The fields used for filtering and sorting are
+    copied into indexed columns (dates as ISO text, prices as numbers) and
+    labels into their own table. The full item is kept as JSON and returned
+    unchanged by query().
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY,
+                    code TEXT NOT NULL,
+                    detail_link TEXT NOT NULL,
+                    region TEXT,
+                    municipality TEXT,
+                    kind TEXT,
+                    status TEXT,
+                    simple_tag TEXT,
+                    conduct_date TEXT,
+                    price_value REAL,
+                    price_per_sqm_value REAL,
+                    item TEXT NOT NULL,
+                    first_seen REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (code, detail_link)
+                );
+                CREATE INDEX IF NOT EXISTS idx_results_code ON results (code);
+                CREATE INDEX IF NOT EXISTS idx_results_region ON results (region, municipality);
+                CREATE INDEX IF NOT EXISTS idx_results_municipality ON results (municipality);
+                CREATE INDEX IF NOT EXISTS idx_results_conduct_date ON results (conduct_date);
+                CREATE INDEX IF NOT EXISTS idx_results_price ON results (price_value);
+                CREATE INDEX IF NOT EXISTS idx_results_price_per_sqm ON results (price_per_sqm_value);
+                CREATE INDEX IF NOT EXISTS idx_results_updated ON results (updated_at);
+                CREATE TABLE IF NOT EXISTS result_labels (
+                    result_id INTEGER NOT NULL REFERENCES results (id),
+                    label TEXT NOT NULL,
+                    PRIMARY KEY (result_id, label)
+                );
+                CREATE INDEX IF NOT EXISTS idx_result_labels_label ON result_labels (label, result_id);
+                """
+            )
+
+    def save(self, record):
+        """Insert or replace the stored result of one AuctionRecord"""
+        if not record.code:
+            return
+        now = time.time()
+        values = (
+            record.code,
+            record.detail_link or "N/A",
+            record.region,
+            record.municipality,
+            record.kind,
+            record.status,
+            record.simple_tag,
+            record.conduct_date.strftime("%Y-%m-%d") if record.conduct_date else None,
+            record.price_value,
+            record.price_per_sqm_value,
+            json.dumps(record.to_dict(), ensure_ascii=False),
+            now,
+            now,
+        )
+        with self._lock, self._conn:
+            result_id = self._conn.execute(
+                "INSERT INTO results (code, detail_link, region, municipality, kind, status, "
+                "simple_tag, conduct_date, price_value, price_per_sqm_value, item, first_seen, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (code, detail_link) DO UPDATE SET region = excluded.region, "
+                "municipality = excluded.municipality, kind = excluded.kind, "
+                "status = excluded.status, simple_tag = excluded.simple_tag, "
+                "conduct_date = excluded.conduct_date, price_value = excluded.price_value, "
+                "price_per_sqm_value = excluded.price_per_sqm_value, item = excluded.item, "
+                "updated_at = excluded.updated_at "
+                "RETURNING id",
+                values,
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM result_labels WHERE result_id = ?", (result_id,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO result_labels (result_id, label) VALUES (?, ?)",
+                [(result_id, label) for label in record.ai_labels],
+            )
+
+    def all_items(self):
+        """Return (id, item) for every stored result"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, item FROM results ORDER BY id").fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def update_labels(self, rows):
+        """Store new ai_labels and simple_tag of (id, item) pairs in one transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE results SET simple_tag = ?, item = ? WHERE id = ?",
+                [
+                    (item.get("simple_tag"), json.dumps(item, ensure_ascii=False), result_id)
+                    for result_id, item in rows
+                ],
+            )
+            self._conn.executemany(
+                "DELETE FROM result_labels WHERE result_id = ?",
+                [(result_id,) for result_id, _ in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO result_labels (result_id, label) VALUES (?, ?)",
+                [
+                    (result_id, label)
+                    for result_id, item in rows
+                    for label in item.get("ai_labels") or []
+                ],
+            )
+
+    def query(self, filters=None, sort="date", descending=False, limit=50, cursor=None):
+        """Return (items, next_cursor) for one page of stored results.
+
+        filters may hold code, region, municipality, kind, status, simple_tag
+        (exact match), labels (a list; every label must be present),
+        date_from/date_to (ISO dates) and min/max_price,
+        min/max_price_per_sqm. Rows without a value for the sort column come
+        last. next_cursor is None on the last page.
+        """
+        filters = filters or {}
+        if sort not in SORT_COLUMNS:
+            raise InvalidQuery(f"Unknown sort {sort}. Use one of: {', '.join(SORT_COLUMNS)}")
+        column = SORT_COLUMNS[sort]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        where, args = [], []
+        for name in ("code", "region", "municipality", "kind", "status", "simple_tag"):
+            if filters.get(name):
+                where.append(f"{name} = ?")
+                args.append(filters[name])
+        for label in filters.get("labels") or []:
+            where.append(
+                "EXISTS (SELECT 1 FROM result_labels l WHERE l.result_id = results.id AND l.label = ?)"
+            )
+            args.append(label)
+        for name, column_name, op in (
+            ("date_from", "conduct_date", ">="),
+            ("date_to", "conduct_date", "<="),
+            ("min_price", "price_value", ">="),
+            ("max_price", "price_value", "<="),
+            ("min_price_per_sqm", "price_per_sqm_value", ">="),
+            ("max_price_per_sqm", "price_per_sqm_value", "<="),
+        ):
+            if filters.get(name) is not None:
+                where.append(f"{column_name} {op} ?")
+                args.append(filters[name])
+
+        # Keyset pagination on (column IS NULL, column, id)
+        if cursor:
+            value, row_id = _decode_cursor(cursor, sort)
+            op = "<" if descending else ">"
+            if value is None:
+                where.append(f"({column} IS NULL AND id {op} ?)")
+                args.append(row_id)
+            else:
+                where.append(
+                    f"({column} {op} ? OR ({column} = ? AND id {op} ?) OR {column} IS NULL)"
+                )
+                args.extend([value, value, row_id])
+
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            f"SELECT id, {column}, item FROM results "
+            + (f"WHERE {' AND '.join(where)} " if where else "")
+            + f"ORDER BY {column} IS NULL, {column} {direction}, id {direction} LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, args + [limit + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_id, last_value, _ = rows[-1]
+            next_cursor = _encode_cursor(sort, last_value, last_id)
+        return [json.loads(row[2]) for row in rows], next_cursor
+
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """Return the process-wide results store, or None if disabled"""
+    global _results_store
+    if config.get("RESULTS_STORE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore(RESULTS_DB_PATH)
+        return _results_store
+
+
+if __name__ == "__main__":
+    # Import earlier JSON dumps: python results_store.py scrape_results/*.json
+    import sys
+
+    store = get_results_store()
+    if store is None:
+        sys.exit("The results store is disabled (RESULTS_STORE_ENABLED=false)")
+    for dump_path in sys.argv[1:]:
+        with open(dump_path, encoding="utf-8") as f:
+            items = json.load(f).get("results", [])
+        for item in items:
+            if "error" not in item:
+                store.save(AuctionRecord.from_dict(item))
+        print(f"Imported {len(items)} results from {dump_path}")
@@ -0,0 +1,166 @@
+import re
+from records import parse_greek_number
+from scraper import config, gemini_fields
+from text_select import normalize
+
+# Fields the rules below can fill, and the ones only Gemini can write
+RULE_FIELDS = ("occupancy_status", "is_bankruptcy", "property_area", "starting_price", "property_type")
+FREE_TEXT_FIELDS = ("address", "property_description", "notes")
+
+# Patterns run on normalize() output: lower case, no accents, final sigma as σ
+_NUMBER = r"(\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?)"
+_AREA_UNIT = r"(?:τ\.?\s?μ\b\.?|τετραγωνικ\w*|m2|μ2|m²|μ²)"
+AREA_WITH_KEYWORD = re.compile(r"(?:εμβαδ|επιφανει)\w*[^\d\n]{0,40}?" + _NUMBER)
+AREA_WITH_UNIT = re.compile(_NUMBER + r"\s*" + _AREA_UNIT)
+STARTING_PRICE = re.compile(
+    r"(?:τιμη\s+(?:τησ\s+)?πρωτησ\s+προσφορασ|τιμη\s+εκκινησησ)[^\d]{0,200}?" + _NUMBER
+)
+OCCUPANCY_RULES = (
+    ("Κατοικείται", re.compile(r"κατοικειται|κατοικουνται|ενοικο|μισθωτηρι|ενοικιαστ|διαμενει|διαμενουν")),
+    ("Ακατοίκητο", re.compile(r"ακατοικητ|μη\s+κατοικουμεν|χωρισ\s+χρηση")),
+    ("Εκκενωμένο", re.compile(r"εκκενωμεν|εκκενωθηκε")),
+)
+# A negation up to two words before an occupancy term ("δεν κατοικειται",
+# "δεν υπαρχουν ενοικοι") turns it around
+NEGATION_BEFORE = re.compile(r"\b(?:δεν|μη|ουτε)\s+(?:\w+\s+){0,2}$")
+# What a negated occupancy term stands for; the others settle nothing
+NEGATED_OCCUPANCY = {"Κατοικείται": "Ακατοίκητο"}
+# "αν κατοικειται" (whether it is occupied) settles nothing either
+QUESTION_BEFORE = re.compile(r"\b(?:αν|εαν)\s+$")
+BANKRUPTCY = re.compile(
+    r"πτωχευσ|πτωχευτικ|εκκαθαρισ|ειδικ\w*\s+διαχειρισ|λυσ\w*\s+(?:τησ\s+)?εταιρει"
+)
+PROPERTY_TYPES = (
+    ("Διαμέρισμα", re.compile(r"διαμερισμα")),
+    ("Μεζονέτα", re.compile(r"μεζονετα")),
+    ("Μονοκατοικία", re.compile(r"μονοκατοικια")),
+    ("Κατάστημα", re.compile(r"καταστημα")),
+    ("Αποθήκη", re.compile(r"αποθηκ")),
+    ("Θέση Στάθμευσης", re.compile(r"θεσ\w*\s+σταθμευσ")),
+    ("Αγροτεμάχιο", re.compile(r"αγροτεμαχι")),
+    ("Οικόπεδο", re.compile(r"οικοπεδ")),
+)
+
+
+def _distinct_numbers(pattern, text):
+    values = []
+    for match in pattern.finditer(text):
+        value = parse_greek_number(match.group(1))
+        if value and value not in values:
+            values.append(value)
+    return values
+
+
+def _area(text):
+    anchored = _distinct_numbers(AREA_WITH_KEYWORD, text)
+    with_unit = _distinct_numbers(AREA_WITH_UNIT, text)
+    if len(anchored) == 1 and set(with_unit) <= set(anchored):
+        return anchored[0], 0.9
+    if not anchored and len(with_unit) == 1:
+        return with_unit[0], 0.8
+    # Several different areas (floors, shares, plot vs building): Gemini decides
+    candidates = anchored or with_unit
+    return (candidates[0], 0.4) if candidates else (None, 0.0)
+
+
+def _starting_price(text, list_price):
+    found = _distinct_numbers(STARTING_PRICE, text)
+    listed = parse_greek_number(list_price)
+    if len(found) == 1:
+        if listed is None or abs(found[0] - listed) < 1:
+            return found[0], 0.95 if listed else 0.85
+        return found[0], 0.5
+    if listed:
+        # The list price is the auction's starting price
+        return listed, 0.85
+    return None, 0.0
+
+
+def _occupancy(text, complete=True):
+    matched = []
+    inconclusive = False
+    for status, pattern in OCCUPANCY_RULES:
+        for match in pattern.finditer(text):
+            before = max(0, match.start() - 40), match.start()
+            found = status
+            if QUESTION_BEFORE.search(text, *before):
+                found = None
+            elif NEGATION_BEFORE.search(text, *before):
+                found = NEGATED_OCCUPANCY.get(status)
+            if found is None:
+                inconclusive = True
+            elif found not in matched:
+                matched.append(found)
+    if len(matched) == 1:
+        return matched[0], 0.9
+    if not matched:
+        # Gemini's prompt also answers N/A without any of these terms, and it
+        # only reads the selected part of a document the rules read whole
+        return "N/A", 0.85 if complete and not inconclusive else 0.3
+    return matched[0], 0.4
+
+
+def _property_type(text):
+    counts = []
+    for label, pattern in PROPERTY_TYPES:
+        positions = [m.start() for m in pattern.finditer(text)]
+        if positions:
+            counts.append((len(positions), -positions[0], label))
+    if not counts:
+        return "N/A", 0.3
+    counts.sort(reverse=True)
+    count, first, label = counts[0]
+    mentioned_first = -first == min(-c[1] for c in counts)
+    if mentioned_first and (len(counts) == 1 or count >= 2 * counts[1][0]):
+        return label, 0.85
+    return label, 0.5
+
+
+def extract_rule_fields(text, list_price=None, complete=True):
+    """Read the RULE_FIELDS of an auction document with fixed patterns.
+    complete is False when text stops before the end of the document; a
+    term missing from it then says little.
+    Returns {field: (value, confidence)} with confidence between 0 and 1."""
+    text = normalize(text)
+    return {
+        "occupancy_status": _occupancy(text, complete),
+        "is_bankruptcy": (True, 0.9) if BANKRUPTCY.search(text) else (False, 0.85 if complete else 0.3),
+        "property_area": _area(text),
+        "starting_price": _starting_price(text, list_price),
+        "property_type": _property_type(text),
+    }
+
+
+def _enabled(name, default="true"):
+    return config.get(name, default).lower() not in ("0", "false", "no")
+
+
+RULES_ENABLED = _enabled("RULES_ENABLED")
+RULES_MIN_CONFIDENCE = float(config.get("RULES_MIN_CONFIDENCE") or 0.8)
+# Free text fields that still need Gemini when the rules settle everything
+# else. With them every document is still sent (for fewer fields); empty to
+# skip Gemini for every document the rules can read
+GEMINI_REQUIRED_FIELDS = tuple(
+    field.strip()
+    for field in (config.get("GEMINI_REQUIRED_FIELDS", ",".join(FREE_TEXT_FIELDS))).split(",")
+    if field.strip()
+)
+
+
+def settled_rule_fields(text, list_price=None, complete=True):
+    """Return {field: value} for the rule fields read with at least
+    RULES_MIN_CONFIDENCE, or {} when the rules are disabled"""
+    if not RULES_ENABLED:
+        return {}
+    return {
+        field: value
+        for field, (value, confidence) in extract_rule_fields(text, list_price, complete).items()
+        if confidence >= RULES_MIN_CONFIDENCE
+    }
+
+
+def fields_for_gemini(settled):
+    """The fields Gemini is asked for: every rule field that is not settled,
+    plus GEMINI_REQUIRED_FIELDS. Empty when the rules settled everything."""
+    unsettled = [field for field in RULE_FIELDS if field not in settled]
+    return gemini_fields(unsettled + list(GEMINI_REQUIRED_FIELDS))
@@ -1,20 +1,109 @@
-from playwright.sync_api import sync_playwright
 from datetime import datetime
+import asyncio
+import queue
+import threading
 import requests
-import PyPDF2
-import io
 import google.generativeai as genai
-import os
 import random
-import time
 import json
-import re
+import functools
 from dotenv import dotenv_values
+from cache import content_hash
+from http_clients import close_async_client, get_session
+from rate_control import rate_controller
+from records import AuctionRecord
+from text_select import select_relevant_text
 
-# BYPASS_HUMAN_BEHAVIOR: If True, all delays and human-like waits are skipped
-BYPASS_HUMAN_BEHAVIOR = False  # Set to True to skip all waits and scraping is instant
 config = dotenv_values()  # Load .env file into a dictionary
-print(BYPASS_HUMAN_BEHAVIOR)
+
+# One instruction per key of the analysis, in the order Gemini answers them.
+# gemini_prompt() asks for a subset of them, e.g. only the fields the rule
+# extractor could not read.
+GEMINI_FIELD_INSTRUCTIONS = {
+    "property_area": '- "property_area": Total area in square meters (combine if multiple, e.g., for multiple floors or spaces). Use only numbers as float (e.g., 130.06). Accept formats like "εμβαδόν 88,52 τ.μ.", "88,52 τ.μ.", "συνολική επιφάνεια 124,35". If not found, return null.',
+    "starting_price": '- "starting_price": Starting price in euros. Use only numbers as float (e.g., 123000.0). If not found, return null.',
+    "address": '- "address": Street, number, area. Combine multiple lines if needed. Normalize and clean address fields (remove extra line breaks, labels like "Οδός", etc.). If not found, return "N/A".',
+    "property_description": '- "property_description": One or two sentence description of the property usage/type/location. If not found, return "N/A".',
+    "notes": '- "notes": Any special conditions or clauses like rights, restrictions, mortgages, liens, third-party rights, servitudes, pending legal issues, or if the auction is related to debt, mortgage, or enforcement. If not found, return "N/A".',
+    "occupancy_status": """- "occupancy_status":
+  - If text contains: "κατοικείται", "ένοικος", "μισθωτήριο", "ενοικιαστής", "διαμένει" → return "Κατοικείται"
+  - If contains: "ακατοίκητο", "μη κατοικούμενο", "χωρίς χρήση" → return "Ακατοίκητο"
+  - If contains: "εκκενωμένο", "εκκενώθηκε" → return "Εκκενωμένο"
+  - Otherwise → return "N/A\"""",
+    "is_bankruptcy": '- "is_bankruptcy": true if the text contains any of the following: "πτώχευση", "εκκαθάριση", "ειδική διαχείριση", "πτωχευτική διαδικασία", "υπό εκκαθάριση", "λύση εταιρείας", otherwise false.',
+    "property_type": '- "property_type": The specific type of property (e.g., "Διαμέρισμα", "Οικόπεδο", "Αγροτεμάχιο", "Κατάστημα", "Μονοκατοικία"). Try to infer from descriptions even if not explicit. If not found, return "N/A".',
+}
+GEMINI_FIELDS = tuple(GEMINI_FIELD_INSTRUCTIONS)
+# Additional rules and the keys they are about
+GEMINI_EXTRA_RULES = (
+    (("property_area", "starting_price"), 'For Greek numbers like "94.000,50", convert to float: 94000.5'),
+    (("property_area",), 'Accept formats like "εμβαδόν 88,52 τ.μ.", "88,52 τ.μ.", "συνολική επιφάνεια 124,35"'),
+    (("property_area",), "If multiple areas are mentioned (e.g., 2 floors), sum them."),
+    (("address",), 'Normalize and clean address fields (remove extra line breaks, labels like "Οδός", etc.)'),
+    (("notes",), 'If auction is related to debt, mortgage, enforcement, extract that into "notes".'),
+)
+GEMINI_EXAMPLE = {
+    "property_area": 344.06,
+    "starting_price": 123000.0,
+    "address": "Παπαζαχαρίου 54, Λάρισα, Φιλιππούπολη",
+    "property_description": "Διαμέρισμα πρώτου ορόφου, κατάλληλο για κατοικία.",
+    "notes": "Υπάρχει υποθήκη υπέρ της Συνεταιριστικής Τράπεζας Θεσσαλίας.",
+    "occupancy_status": "Κατοικείται",
+    "is_bankruptcy": False,
+    "property_type": "Διαμέρισμα",
+}
+
+
+def gemini_fields(fields):
+    """fields as a tuple in GEMINI_FIELDS order, without unknown names"""
+    return tuple(field for field in GEMINI_FIELDS if field in fields)
+
+
+def _gemini_instructions(fields):
+    rules = [f"- {rule}" for keys, rule in GEMINI_EXTRA_RULES if set(keys) & set(fields)]
+    example = json.dumps({field: GEMINI_EXAMPLE[field] for field in fields}, ensure_ascii=False, indent=2)
+    return (
+        "\nYou are a real estate analyst. Analyze the following Greek auction document and extract structured information.\n\n"
+        "Return a valid JSON with the following keys:\n"
+        + "".join(GEMINI_FIELD_INSTRUCTIONS[field] + "\n" for field in fields)
+        + ("\nADDITIONAL RULES:\n" + "".join(rule + "\n" for rule in rules) if rules else "")
+        + f"\nExample output format:\n{example}\n\n"
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def gemini_prompt(fields=GEMINI_FIELDS):
+    """The single-document prompt asking for fields (see gemini_fields)"""
+    return _gemini_instructions(fields) + "Document:\n"
+
+
+@functools.lru_cache(maxsize=None)
+def gemini_batch_prompt(fields=GEMINI_FIELDS):
+    """Several documents in one request; each document keeps the
+    single-document instructions and keys, and answers are matched back by
+    auction_code"""
+    return (
+        """
+The text below contains several Greek auction documents. Each one starts with a line "=== DOCUMENT <code> ===".
+Analyze every document on its own, following the single-document instructions further down.
+
+Return a valid JSON array with one object per document, in the same order as the documents.
+Each object must have an "auction_code" key holding the <code> of its document, plus every key described below.
+Never merge information from different documents.
+
+Single-document instructions:
+"""
+        + _gemini_instructions(fields)
+        + "Documents:\n"
+    )
+
+
+# Bump GEMINI_PROMPT_VERSION whenever the prompt changes meaning; cached
+# analyses are keyed by it. The prompt hash is included so edits that forget
+# the bump still invalidate the cache.
+GEMINI_PROMPT = gemini_prompt()
+GEMINI_PROMPT_VERSION = f"1-{content_hash(GEMINI_PROMPT)[:12]}"
+
 
 def format_date(date_str):
     """Convert YYYY-MM-DD to DD/MM/YYYY format"""
@@ -92,49 +181,6 @@ def construct_url(params):
     return final_url
 
 
-def parse_greek_number(number_str):
-    """Parse Greek-formatted numbers to float.
-    Greek format: 94.000,00 € (period for thousands, comma for decimal)
-    English format needs: 94000.00
-    """
-    if not number_str or number_str == "N/A":
-        return None
-
-    try:
-        # Clean the string
-        cleaned = str(number_str).strip()
-
-        # Remove currency symbols and extra spaces
-        cleaned = cleaned.replace("€", "").replace("EUR", "").replace("$", "").strip()
-
-        # Handle Greek number format
-        if "," in cleaned and "." in cleaned:
-            # Greek format: 94.000,50 (periods for thousands, comma for decimal)
-            parts = cleaned.split(",")
-            if len(parts) == 2:
-                # Replace periods in the integer part (thousands separators)
-                integer_part = parts[0].replace(".", "")
-                decimal_part = parts[1]
-                cleaned = f"{integer_part}.{decimal_part}"
-        elif "," in cleaned and "." not in cleaned:
-            # Only comma (decimal separator): 94,50
-            cleaned = cleaned.replace(",", ".")
-        elif "." in cleaned and "," not in cleaned:
-            # Check if it's thousands separator or decimal
-            parts = cleaned.split(".")
-            if len(parts) > 2:
-                # Multiple periods = thousands separators: 1.234.567
-                cleaned = cleaned.replace(".", "")
-            elif len(parts) == 2 and len(parts[1]) == 3:
-                # Likely thousands separator: 94.000
-                cleaned = cleaned.replace(".", "")
-            # If decimal part has 1-2 digits, keep as decimal: 94.5 or 94.50
-
-        return float(cleaned)
-    except (ValueError, AttributeError):
-        return None
-
-
 def get_random_user_agent():
     """Return a random user agent string"""
     user_agents = [
@@ -147,50 +193,85 @@ def get_random_user_agent():
     return random.choice(user_agents)
 
 
-def human_like_delay(min_seconds=0.5, max_seconds=2):
-    """Sleep for a random amount of time to simulate human behavior, unless bypassed"""
-    if BYPASS_HUMAN_BEHAVIOR:
-        return
-    delay = random.uniform(min_seconds, max_seconds)
-    print(f"Waiting {delay:.2f} seconds...")
-    time.sleep(delay)
-
+def normalize_listing_card(raw):
+    """Turn the raw text fields of one listing card into the engine's card dict.
 
-def simulate_human_scrolling(page):
-    """Simulate human-like scrolling behavior, unless bypassed"""
-    if BYPASS_HUMAN_BEHAVIOR:
-        return
-    try:
-        # Random scroll down
-        scroll_distance = random.randint(200, 600)
-        page.evaluate(f"window.scrollBy(0, {scroll_distance})")
-        time.sleep(random.uniform(0.2, 0.5))
-
-        # Sometimes scroll back up a bit
-        if random.random() < 0.3:
-            scroll_back = random.randint(100, 300)
-            page.evaluate(f"window.scrollBy(0, -{scroll_back})")
-            time.sleep(random.uniform(0.2, 0.4))
-    except Exception as e:
-        print(f"Error during scrolling simulation: {e}")
-
-
-def simulate_mouse_movement(page):
-    """Simulate random mouse movements, unless bypassed"""
-    if BYPASS_HUMAN_BEHAVIOR:
-        return
-    try:
-        # Move mouse to random positions
-        for _ in range(random.randint(1, 2)):  # Reduced from 1-3 to 1-2
-            x = random.randint(100, 800)
-            y = random.randint(100, 600)
-            page.mouse.move(x, y)
-            time.sleep(random.uniform(0.05, 0.15))  # Reduced from 0.1-0.3
-    except Exception as e:
-        print(f"Error during mouse movement simulation: {e}")
+    raw holds date, debtor, kind, location, price, status, post_date, code,
+    part_label and href as read from div.AList-BoxContainer; any of them may
+    be missing or None.
+    """
+    def value(key):
+        text = raw.get(key)
+        text = text.strip() if isinstance(text, str) else text
+        return text if text else "N/A"
+
+    kind = value("kind").replace("Ακίνητο -", "").strip()
+
+    region = "N/A"
+    municipality = "N/A"
+    for line in value("location").split("\n"):
+        if "Περιφέρεια:" in line:
+            region = line.replace("Περιφέρεια:", "").strip()
+        elif "Δήμος:" in line:
+            municipality = line.replace("Δήμος:", "").strip()
+
+    detail_link = "N/A"
+    href = raw.get("href")
+    if href:
+        if href.startswith("http"):
+            detail_link = href
+        else:
+            detail_link = "https://www.eauction.gr" + href
+
+    return {
+        "conduct_date": value("date"),
+        "debtor": value("debtor"),
+        "kind": kind,
+        "region": region,
+        "municipality": municipality,
+        "price": value("price"),
+        "status": value("status"),
+        "post_date": value("post_date"),
+        "code": value("code"),
+        "part_label": value("part_label"),
+        "detail_link": detail_link,
+    }
 
 
-def scrape_auctions(
+def select_pdf_links(pdf_anchors, label="auction"):
+    """Return (all_pdf_links, pdf_href) from the (href, title) pairs of a detail
+    page's PDF anchors. The PDF for analysis is the first one titled 'report',
+    else the first one."""
+    all_pdf_links = []
+    pdf_href_for_analysis = None
+    if pdf_anchors:
+        print(f"Found {len(pdf_anchors)} PDF anchor(s) for {label}")
+        for i, (pdf_href, pdf_title) in enumerate(pdf_anchors):
+            if pdf_href:
+                full_pdf_url = (
+                    f"https://www.eauction.gr{pdf_href}"
+                    if not pdf_href.startswith("http")
+                    else pdf_href
+                )
+                all_pdf_links.append(full_pdf_url)
+                print(f"PDF {i+1}: {full_pdf_url} (title: {pdf_title})")
+                # If title starts with 'report', prefer this for analysis
+                if not pdf_href_for_analysis and pdf_title and pdf_title.lower().startswith("report"):
+                    pdf_href_for_analysis = full_pdf_url
+        if not all_pdf_links:
+            print(f"Warning: PDF containers found but no valid links for {label}")
+    else:
+        print(f"No PDF anchors found for {label}")
+
+    # Set the PDF for analysis: prefer 'report', else first
+    if not pdf_href_for_analysis and all_pdf_links:
+        pdf_href_for_analysis = all_pdf_links[0]
+    if pdf_href_for_analysis:
+        print(f"Using PDF for analysis: {pdf_href_for_analysis}")
+    return all_pdf_links, pdf_href_for_analysis
+
+
+def build_search_url(
     conduct_from=None,
     conduct_to=None,
     posting_from=None,
@@ -199,19 +280,9 @@ def scrape_auctions(
     regionParam=None,
     propertyParam=None,
     municipalityParam=None,
-    selectedRegion=None,
-    selectedMunicipality=None,
-    selectedPropertyType=None,
-    page=1
+    page=1,
 ):
-    # Configure Gemini at the start
-    gemini_model = configure_gemini()
-
-    results = []
-
-    # Print startPage and endPage for debugging
-    print(f"Received page: {page}")
-
+    """Translate the /scrape filters into the eauction.gr listing URL"""
     # Prepare parameters
     params = {
         "conductFrom": (
@@ -233,9 +304,6 @@ def scrape_auctions(
     print(f"- regionParam: {regionParam}")
     print(f"- propertyParam: {propertyParam}")
     print(f"- municipalityParam: {municipalityParam}")
-    print(f"- selectedRegion: {selectedRegion}")
-    print(f"- selectedMunicipality: {selectedMunicipality}")
-    print(f"- selectedPropertyType: {selectedPropertyType}")
 
     # Handle sorting
     if sort_by:
@@ -265,518 +333,120 @@ def scrape_auctions(
     # Construct URL with specific format
     url = construct_url(params)
     print(f"Generated URL: {url}")
+    return url
 
-    with sync_playwright() as p:
-        # Launch browser with more realistic settings
-        browser = p.chromium.launch(
-            headless=False,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--disable-dev-shm-usage",
-                "--disable-extensions",
-                "--no-sandbox",
-                "--disable-web-security",
-                "--disable-features=VizDisplayCompositor",
-            ],
-        )
-
-        # Create context with random user agent
-        context = browser.new_context(
-            user_agent=get_random_user_agent(),
-            viewport={
-                "width": random.randint(1200, 1920),
-                "height": random.randint(800, 1080),
-            },
-            locale="en-US",
-            timezone_id="Europe/Athens",
-        )
-
-        # Remove webdriver property
-        context.add_init_script(
-            """
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined,
-            });
-        """
-        )
 
-        p_page = context.new_page()
+def scrape_auctions(
+    conduct_from=None,
+    conduct_to=None,
+    posting_from=None,
+    posting_to=None,
+    sort_by="auctionDateAsc",
+    regionParam=None,
+    propertyParam=None,
+    municipalityParam=None,
+    selectedRegion=None,
+    selectedMunicipality=None,
+    selectedPropertyType=None,
+    page=1,
+    detail_workers=None,
+    analysis_workers=None,
+    on_result=None,
+    cancel_event=None,
+    engine=None,
+    end_page=None,
+):
+    """Synchronous entry point used by app.py; runs the async scraping engine.
+    Uses the shared browser pool when the app started one. Pages page through
+    end_page (a number, or "all") are crawled in one browser session; on_result,
+    cancel_event and engine are passed through to scrape_auctions_async."""
+    from async_scraper import scrape_auctions_async
+    from browser_pool import get_browser_pool
+
+    browser_pool = get_browser_pool()
+    coro = scrape_auctions_async(
+        conduct_from=conduct_from,
+        conduct_to=conduct_to,
+        posting_from=posting_from,
+        posting_to=posting_to,
+        sort_by=sort_by,
+        regionParam=regionParam,
+        propertyParam=propertyParam,
+        municipalityParam=municipalityParam,
+        selectedRegion=selectedRegion,
+        selectedMunicipality=selectedMunicipality,
+        selectedPropertyType=selectedPropertyType,
+        page=page,
+        detail_workers=detail_workers,
+        analysis_workers=analysis_workers,
+        browser_pool=browser_pool,
+        on_result=on_result,
+        cancel_event=cancel_event,
+        engine=engine,
+        end_page=end_page,
+    )
+    if browser_pool:
+        return browser_pool.run(coro)
+    return asyncio.run(_run_and_close_client(coro))
+
 
-        total_results = 0
-        try:
-            print("Loading main auction page...")
-            p_page.goto(url, timeout=60000)
-
-            # Extract total results count
-            try:
-                # Wait for the element to be available before reading it
-                total_text_selector = ".AuctionsListSearchOrderingTbl .AuctionsList-resultstxt"
-                print(f"Waiting for selector: {total_text_selector}")
-                total_text_elem = p_page.wait_for_selector(total_text_selector, timeout=15000) # Wait up to 15s
-                
-                total_text = total_text_elem.inner_text().strip()
-                print(f"Raw text for total results: '{total_text}'")
-
-                match = re.search(r"\d+", total_text)
-                if match:
-                    total_results = int(match.group())
-                else:
-                    total_results = 0
-                print(f"Total results found: {total_results}")
-
-            except Exception as e:
-                print(f"Could not extract total results: {e}")
-                total_results = 0
-                
-                print(total_results,"THIS IS TOTAL RESULTS")
-
-            # Calculate total pages (20 auctions per page)
-            total_pages = (total_results + 19) // 20 if total_results > 0 else 1
-            print(f"Total pages: {total_pages}")
-
-            # Validate the requested page
-            if page < 1 or page > total_pages:
-                error_msg = f"Requested page {page} is not valid. Total pages available: {total_pages}."
-                print(error_msg)
-                return {"results": [], "total_results": total_results, "error": error_msg}
-
-            # Initial human-like delay
-            human_like_delay(1.2, 2.6)
-
-            # Simulate human behavior on main page
-            simulate_human_scrolling(p_page)
-            simulate_mouse_movement(p_page)
-
-            # Wait for content to load
-            p_page.wait_for_timeout(random.randint(800, 1500))
-
-            auctions = p_page.query_selector_all("div.AList-BoxContainer")
-            print(f"Found {len(auctions)} auctions to process")
-
-            for idx, auction in enumerate(auctions):
-                print(f"\nProcessing auction #{idx+1}/{len(auctions)}")
-
-                try:
-                    # Add delay between each auction processing
-                    if idx > 0:  # Don't delay before first auction
-                        human_like_delay(0.8, 2.2)
-
-                    date_element = auction.query_selector(
-                        "div.AList-BoxMainCell2 .DateIcon"
-                    )
-                    conduct_date = (
-                        date_element.inner_text().strip() if date_element else "N/A"
-                    )
-
-                    auction.wait_for_selector(
-                        "div.AList-BoxMainCell3 .AList-BoxTextBlueBold", timeout=3000
-                    )
-                    debtor_element = auction.query_selector(
-                        "div.AList-BoxMainCell3 .AList-BoxTextBlueBold"
-                    )
-                    debtor = (
-                        debtor_element.inner_text().strip() if debtor_element else "N/A"
-                    )
-
-                    auction.wait_for_selector(
-                        "div.AList-BoxMainCell4 .AList-BoxTextBlueBold", timeout=3000
-                    )
-                    kind_element = auction.query_selector(
-                        "div.AList-BoxMainCell4 .AList-BoxTextBlueBold"
-                    )
-                    kind_with_property = (
-                        kind_element.inner_text().strip() if kind_element else "N/A"
-                    )
-                    kind = kind_with_property.replace("Ακίνητο -", "").strip()
-
-                    region_element = auction.query_selector(
-                        "div.AList-BoxMainCell4 .AList-BoxTextBlue"
-                    )
-                    region = "N/A"
-                    municipality = "N/A"
-                    if region_element:
-                        text = region_element.inner_text().strip()
-                        lines = text.split("\n")
-                        for line in lines:
-                            if "Περιφέρεια:" in line:
-                                region = line.replace("Περιφέρεια:", "").strip()
-                            elif "Δήμος:" in line:
-                                municipality = line.replace("Δήμος:", "").strip()
-
-                    auction.wait_for_selector(
-                        "div.AList-Boxheader .AList-BoxheaderRight .AList-BoxTextPrice",
-                        timeout=3000,
-                    )
-                    price_element = auction.query_selector(
-                        "div.AList-Boxheader .AList-BoxheaderRight .AList-BoxTextPrice"
-                    )
-                    price = (
-                        price_element.inner_text().strip() if price_element else "N/A"
-                    )
-
-                    auction.wait_for_selector(
-                        "div.AList-Boxheader .AList-BoxheaderLeft .AList-BoxTextBlueBold",
-                        timeout=3000,
-                    )
-                    status_element = auction.query_selector(
-                        "div.AList-Boxheader .AList-BoxheaderLeft .AList-BoxTextBlueBold"
-                    )
-                    status = (
-                        status_element.inner_text().strip() if status_element else "N/A"
-                    )
-
-                    auction.wait_for_selector(
-                        "div.AList-Boxheader .AList-BoxheaderLeft .AList-BoxTextBlueBold",
-                        timeout=3000,
-                    )
-
-                    auction.wait_for_selector(
-                        "div.AList-BoxFooter .AList-BoxFooterLeft .AList-BoxTextBlue500"
-                    )
-
-                    elements = auction.query_selector_all(
-                        "div.AList-BoxFooter .AList-BoxFooterLeft .AList-BoxTextBlue500"
-                    )
-
-                    postDate = (
-                        elements[0].inner_text().strip() if len(elements) > 0 else "N/A"
-                    )
-                    uniqueCode = (
-                        elements[1].inner_text().strip() if len(elements) > 1 else "N/A"
-                    )
-
-                    bold_element = auction.query_selector(
-                        "div.AList-BoxFooter .AList-BoxFooterLeft b"
-                    )
-                    partLabel = (
-                        bold_element.inner_text().strip() if bold_element else "N/A"
-                    )
-
-                    link_element = auction.query_selector("a")
-
-                    print(f"Basic info: {kind}, {region}, {municipality}")
-
-                    detail_link = "N/A"
-                    auction_code = "N/A"
-                    if link_element:
-                        href = link_element.get_attribute("href")
-                        if href:
-                            if href.startswith("http"):
-                                detail_link = href
-                            else:
-                                detail_link = "https://www.eauction.gr" + href
-
-                            # Extract code from href like '/Auction/Details/123456'
-                            try:
-                                # Ensure we are splitting a string and it has enough parts
-                                href_parts = href.split("/")
-                                if len(href_parts) > 1:
-                                    auction_code = href_parts[-1]
-                            except Exception:
-                                auction_code = "N/A"
-
-                    # Scrape detail page info with enhanced human behavior
-                    detail_info = None
-                    duration = None
-                    pdf_href = None
-                    all_pdf_links = []
-                    pdf_analysis = {}  # Use a dict for structured data
-
-                    if detail_link != "N/A":
-                        try:
-                            print(f"Opening detail page for auction #{idx+1}")
-
-                            # Create new page for detail
-                            detail_page = context.new_page()
-
-                            # Human-like delay before opening detail page
-                            human_like_delay(0.9, 1.8)
-
-                            detail_page.goto(detail_link, timeout=60000)
-
-                            # Simulate human behavior on detail page
-                            detail_page.wait_for_timeout(random.randint(500, 1000))
-                            simulate_human_scrolling(detail_page)
-                            simulate_mouse_movement(detail_page)
-
-                            # Extract ALL PDF hrefs with delay
-                            time.sleep(random.uniform(0.2, 0.5))
-                            pdf_anchors = detail_page.query_selector_all(
-                                "div.AuctionDetailsPDFItem .AuctionDetailsPDFtext .DownloadAuctionFile"
-                            )
-                            all_pdf_links = []
-                            pdf_href_for_analysis = None
-                            if pdf_anchors:
-                                print(f"Found {len(pdf_anchors)} PDF anchor(s) for auction #{idx+1}")
-                                print(pdf_anchors,"these are pdfs")
-                                for i, pdf_anchor in enumerate(pdf_anchors):
-                                    pdf_href = pdf_anchor.get_attribute("href")
-                                    pdf_title = pdf_anchor.get_attribute("title")
-                                    if pdf_href:
-                                        full_pdf_url = (
-                                            f"https://www.eauction.gr{pdf_href}"
-                                            if not pdf_href.startswith("http")
-                                            else pdf_href
-                                        )
-                                        all_pdf_links.append(full_pdf_url)
-                                        print(f"PDF {i+1}: {full_pdf_url} (title: {pdf_title})")
-                                        # If title starts with 'report', prefer this for analysis
-                                        if not pdf_href_for_analysis and pdf_title and pdf_title.lower().startswith("report"):
-                                            pdf_href_for_analysis = full_pdf_url
-                                if not all_pdf_links:
-                                    print(f"Warning: PDF containers found but no valid links for auction #{idx+1}")
-                            else:
-                                print(f"No PDF anchors found for auction #{idx+1}")
-                                all_pdf_links = []
-
-                            # Set the PDF for analysis: prefer 'report', else first
-                            if not pdf_href_for_analysis and all_pdf_links:
-                                pdf_href_for_analysis = all_pdf_links[0]
-                            pdf_href = pdf_href_for_analysis
-                            if pdf_href:
-                                print(f"Using PDF for analysis: {pdf_href}")
-
-                            # Process only the SELECTED PDF with Gemini if available
-                            if pdf_href and gemini_model:
-                                try:
-                                    print(f"Processing selected PDF for auction #{idx+1}")
-                                    # Human-like delay before PDF processing
-                                    human_like_delay(0.9, 1.8)
-
-                                    # Download and extract PDF text
-                                    pdf_text = download_and_extract_pdf_text(pdf_href)
-
-                                    # OPTIONAL: Log raw PDF text for testing
-                                    print("---------- RAW PDF TEXT ----------")
-                                    print(pdf_text[:2000])  # First 2000 characters
-                                    print("---------- END TEXT -------------")
-
-                                    # Analyze with Gemini
-                                    if pdf_text:
-                                        gemini_json_response = (
-                                            analyze_pdf_with_gemini(
-                                                pdf_text, gemini_model
-                                            )
-                                        )
-                                        if gemini_json_response:
-                                            try:
-                                                # Clean up response string
-                                                if (
-                                                    "```json" in gemini_json_response
-                                                ):
-                                                    gemini_json_response = (
-                                                        gemini_json_response.split(
-                                                            "```json"
-                                                        )[1].split("```")[0]
-                                                    )
-                                                elif "```" in gemini_json_response:
-                                                    gemini_json_response = (
-                                                        gemini_json_response.split(
-                                                            "```"
-                                                        )[1]
-                                                    )
-
-                                                # DEBUG LOGGING
-                                                print(
-                                                    "--------- Gemini Raw JSON Response ----------"
-                                                )
-                                                print(gemini_json_response)
-                                                print(
-                                                    "--------------------------------------------"
-                                                )
-
-                                                data = json.loads(
-                                                    gemini_json_response.strip()
-                                                )
-                                                pdf_analysis.update(data)
-
-                                                # Add price_per_sqm logic only if area and price are valid
-                                                area = data.get("property_area")
-
-                                                # Parse Greek-formatted price properly
-                                                numeric_price = parse_greek_number(
-                                                    price
-                                                )
-
-                                                # Also handle Greek-formatted area from PDF if needed
-                                                if isinstance(area, str):
-                                                    area = parse_greek_number(area)
-
-                                                if (
-                                                    area
-                                                    and numeric_price
-                                                    and isinstance(
-                                                        area, (int, float)
-                                                    )
-                                                    and area > 0
-                                                ):
-                                                    price_per_sqm = (
-                                                        numeric_price / area
-                                                    )
-                                                    pdf_analysis[
-                                                        "price_per_sqm"
-                                                    ] = f"€{price_per_sqm:,.2f}"
-                                                else:
-                                                    pdf_analysis[
-                                                        "price_per_sqm"
-                                                    ] = "N/A"
-
-                                                print(
-                                                    f"Gemini analysis completed for auction #{idx+1}"
-                                                )
-                                            except (
-                                                json.JSONDecodeError,
-                                                KeyError,
-                                                Exception,
-                                            ) as e:
-                                                print(
-                                                    f"Error parsing Gemini JSON for auction #{idx+1}: {e}"
-                                                )
-                                        else:
-                                            print(
-                                                f"Gemini returned no response for auction #{idx+1}"
-                                            )
-                                    else:
-                                        print(
-                                            f"Could not extract text from PDF for auction #{idx+1}"
-                                        )
-                                except Exception as e:
-                                    print(f"Error processing PDF for auction #{idx+1}: {e}")
-
-                        except Exception as e:
-                            print(
-                                f"Error scraping detail page for auction #{idx+1}: {e}"
-                            )
-                            detail_info = None
-                            duration = None
-                            pdf_href = None
-                            all_pdf_links = []
-                        finally:
-                            # Close detail page
-                            detail_page.close()
-                            # Random delay after closing detail page
-                            human_like_delay(0.8, 1.7)
-                    else:
-                        pdf_href = None
-                        all_pdf_links = []
-                        duration = None
-
-                    # AI Labeling Logic
-                    ai_labels = []
-                    simple_tag = "N/A"
-                    numeric_price = parse_greek_number(price)
-                    price_per_sqm_str = pdf_analysis.get("price_per_sqm", "N/A")
-                    price_per_sqm = (
-                        parse_greek_number(price_per_sqm_str)
-                        if price_per_sqm_str != "N/A"
-                        else None
-                    )
-
-                    # 1. Incomplete
-                    if not pdf_href or not pdf_analysis.get("property_area"):
-                        ai_labels.append("Incomplete")
-                        simple_tag = "Incomplete"
-
-                    # 2. Πτώχευση (Bankruptcy)
-                    if pdf_analysis.get("is_bankruptcy"):
-                        ai_labels.append("Πτώχευση")
-
-                    # 3. Expensive
-                    if price_per_sqm and price_per_sqm > 1500:
-                        ai_labels.append("Expensive")
-                        simple_tag = "Expensive"
-
-                    # 4. Καλή Ευκαιρία & Hot
-                    is_within_3_weeks = False
-                    if conduct_date and conduct_date != "N/A":
-                        try:
-                            auction_date_obj = datetime.strptime(
-                                conduct_date, "%d/%m/%Y"
-                            )
-                            if (
-                                auction_date_obj >= datetime.now()
-                                and (auction_date_obj - datetime.now()).days <= 21
-                            ):
-                                is_within_3_weeks = True
-                        except (ValueError, TypeError):
-                            pass
-
-                    if (
-                        price_per_sqm
-                        and price_per_sqm < 600
-                        and pdf_analysis.get("property_area", 0) > 70
-                        and is_within_3_weeks
-                    ):
-                        ai_labels.append("Καλή Ευκαιρία")
-                        simple_tag = "Opportunity"
-
-                        # Check for 'Hot'
-                        if pdf_analysis.get(
-                            "property_description"
-                        ) and pdf_analysis.get("property_description") not in [
-                            "N/A",
-                            "",
-                            None,
-                        ]:
-                            ai_labels.append("Hot")
-
-                    # 5. Προσοχή (Caution)
-                    low_price_threshold = 50000
-                    has_risks = "υποθήκη" in pdf_analysis.get(
-                        "notes", ""
-                    ) or "βάρη" in pdf_analysis.get("notes", "")
-                    if (
-                        numeric_price
-                        and numeric_price < low_price_threshold
-                        and (has_risks or "Incomplete" in ai_labels)
-                    ):
-                        ai_labels.append("Προσοχή")
-
-                    # Add to results, merging pdf_analysis data
-                    result_item = {
-                        "code": uniqueCode,
-                        "part_number": partLabel,
-                        "post_date": postDate,
-                        "auction_object": kind,
-                        "status": status,
-                        "price": price,  # This is the Starting Price from the list
-                        "date": conduct_date,
-                        "debtor": debtor,
-                        "kind": kind,  # Retaining for compatibility if needed elsewhere
-                        "region": region,
-                        "municipality": municipality,
-                        "detail_link": detail_link,
-                        "pdf_href": pdf_href,  # First PDF (for backward compatibility)
-                        "all_pdf_links": all_pdf_links,  # All PDF links
-                        "ai_labels": ai_labels,
-                        "simple_tag": simple_tag,
-                        # Add filter context for debugging
-                        "filter_context": {
-                            "selectedRegion": selectedRegion,
-                            "selectedMunicipality": selectedMunicipality,
-                            "selectedPropertyType": selectedPropertyType,
-                        }
-                    }
-                    result_item.update(pdf_analysis)  # Merge PDF data
-                    results.append(result_item)
-
-                    print(f"Completed processing auction #{idx+1}")
-
-                except Exception as e:
-                    print(f"Error parsing auction #{idx+1}: {e}")
-                    results.append({"error": f"Error parsing auction #{idx+1}: {e}"})
-                    continue
+async def _run_and_close_client(coro):
+    """Run a scrape on a private event loop and close the loop's shared HTTP client"""
+    try:
+        return await coro
+    finally:
+        await close_async_client()
+
+
+def iter_auctions(**kwargs):
+    """Generator version of scrape_auctions.
+
+    Yields ("result", index, result_item) as soon as each auction is labeled
+    (completion order; index is its position in the listing), then one
+    ("summary", None, summary) with total_results, result_count and any
+    error. Closing the generator early cancels the scrape.
+    """
+    events = queue.Queue()
+    cancel_event = threading.Event()
 
+    def run():
+        try:
+            output = scrape_auctions(
+                **kwargs,
+                on_result=lambda index, item: events.put(("result", index, item)),
+                cancel_event=cancel_event,
+            )
         except Exception as e:
-            print(f"Error loading page or extracting data: {e}")
-            results.append({"error": f"Error loading page or extracting data: {e}"})
-        finally:
-            # Clean up
-            context.close()
-            browser.close()
+            print(f"Error during streamed scrape: {e}")
+            output = {"results": [], "total_results": 0, "error": str(e)}
+        events.put(("done", None, output))
+
+    threading.Thread(target=run, name="scrape-stream", daemon=True).start()
 
-    print(f"\nCompleted scraping {len(results)} auctions")
-    return {"results": results, "total_results": total_results}
+    streamed = set()
+    try:
+        while True:
+            kind, index, payload = events.get()
+            if kind == "result":
+                streamed.add(id(payload))
+                yield "result", index, payload
+                continue
+
+            # Items that never went through on_result, e.g. page load errors
+            for index, item in enumerate(payload.get("results", [])):
+                if id(item) not in streamed:
+                    yield "result", index, item
+            summary = {
+                "total_results": payload.get("total_results", 0),
+                "result_count": len(payload.get("results", [])),
+            }
+            for key in ("total_pages", "pages_scraped", "error", "cancelled"):
+                if key in payload:
+                    summary[key] = payload[key]
+            yield "summary", None, summary
+            return
+    finally:
+        cancel_event.set()
 
 
 def configure_gemini():
@@ -790,102 +460,138 @@ def configure_gemini():
     return genai.GenerativeModel("gemini-2.5-flash")
 
 
-def download_and_extract_pdf_text(pdf_url):
-    """Download PDF and extract text content with human-like delays, unless bypassed"""
-    try:
-        # Add random delay before downloading
-        if not BYPASS_HUMAN_BEHAVIOR:
-            time.sleep(random.uniform(0.3, 0.8))
-
-        # Set headers to mimic a real browser
-        headers = {
-            "User-Agent": get_random_user_agent(),
-            "Accept": "application/pdf,*/*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        }
-
-        # Download the PDF
-        response = requests.get(pdf_url, headers=headers, timeout=30)
-        response.raise_for_status()
-
-        # Extract text from PDF
-        pdf_file = io.BytesIO(response.content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-        text_content = ""
-        for page in pdf_reader.pages:
-            text_content += page.extract_text().strip() + "\n"
-
-        return text_content.strip()
-    except Exception as e:
-        print(f"Error processing PDF: {e}")
+# Estimated input tokens of PDF text sent to Gemini per document, and the
+# characters that makes (see estimate_tokens in gemini_pool)
+GEMINI_INPUT_TOKENS = int(config.get("GEMINI_INPUT_TOKENS") or 3000)
+GEMINI_INPUT_CHARS = GEMINI_INPUT_TOKENS * 3
+
+
+def clean_pdf_text(text_content):
+    """Strip blank lines and keep the parts of the text relevant to the
+    analysis within the Gemini input budget (see select_relevant_text)"""
+    lines = [line.strip() for line in text_content.splitlines() if line.strip()]
+    return select_relevant_text(lines, GEMINI_INPUT_CHARS)
+
+
+def parse_gemini_json(gemini_json_response):
+    """Strip Markdown code fences from a Gemini reply and parse it as JSON"""
+    if "```json" in gemini_json_response:
+        gemini_json_response = gemini_json_response.split("```json")[1].split("```")[0]
+    elif "```" in gemini_json_response:
+        gemini_json_response = gemini_json_response.split("```")[1]
+    return json.loads(gemini_json_response.strip())
+
+
+def decode_gemini_analysis(gemini_json_response):
+    """Turn a raw Gemini reply into an analysis dict, or None if unusable"""
+    if not gemini_json_response:
+        print("Gemini returned no response")
         return None
 
+    # DEBUG LOGGING
+    print("--------- Gemini Raw JSON Response ----------")
+    print(gemini_json_response)
+    print("--------------------------------------------")
 
-def analyze_pdf_with_gemini(text_content, model):
-    """Analyze PDF content using Gemini with better prompt structure and few-shot guidance. Respects bypass flag."""
-    if not model or not text_content:
+    try:
+        data = parse_gemini_json(gemini_json_response)
+    except (json.JSONDecodeError, IndexError) as e:
+        print(f"Error parsing Gemini JSON: {e}")
+        return None
+    if not isinstance(data, dict):
+        print("Gemini JSON is not an object, ignoring")
         return None
+    return data
+
 
+def decode_gemini_batch(gemini_json_response, doc_ids):
+    """Split a multi-document Gemini reply into {doc_id: analysis dict}.
+    Documents missing from the reply, or with unusable entries, are left out."""
+    if not gemini_json_response:
+        print("Gemini returned no response for batch")
+        return {}
     try:
-        # Add delay to respect API rate limits
-        if not BYPASS_HUMAN_BEHAVIOR:
-            time.sleep(random.uniform(0.4, 0.8))  # Reduced from 0.8-1.5
-
-        # Clean and trim text to stay within token limits
-        cleaned_text = "\n".join(
-            [line.strip() for line in text_content.splitlines() if line.strip()]
-        )
-        cleaned_text = cleaned_text[:14000]  # Keep within safe input length
-
-        prompt = """
-You are a real estate analyst. Analyze the following Greek auction document and extract structured information.
-
-Return a valid JSON with the following keys:
-- "property_area": Total area in square meters (combine if multiple, e.g., for multiple floors or spaces). Use only numbers as float (e.g., 130.06). Accept formats like "εμβαδόν 88,52 τ.μ.", "88,52 τ.μ.", "συνολική επιφάνεια 124,35". If not found, return null.
-- "starting_price": Starting price in euros. Use only numbers as float (e.g., 123000.0). If not found, return null.
-- "address": Street, number, area. Combine multiple lines if needed. Normalize and clean address fields (remove extra line breaks, labels like "Οδός", etc.). If not found, return "N/A".
-- "property_description": One or two sentence description of the property usage/type/location. If not found, return "N/A".
-- "notes": Any special conditions or clauses like rights, restrictions, mortgages, liens, third-party rights, servitudes, pending legal issues, or if the auction is related to debt, mortgage, or enforcement. If not found, return "N/A".
-- "occupancy_status":
-  - If text contains: "κατοικείται", "ένοικος", "μισθωτήριο", "ενοικιαστής", "διαμένει" → return "Κατοικείται"
-  - If contains: "ακατοίκητο", "μη κατοικούμενο", "χωρίς χρήση" → return "Ακατοίκητο"
-  - If contains: "εκκενωμένο", "εκκενώθηκε" → return "Εκκενωμένο"
-  - Otherwise → return "N/A"
-- "is_bankruptcy": true if the text contains any of the following: "πτώχευση", "εκκαθάριση", "ειδική διαχείριση", "πτωχευτική διαδικασία", "υπό εκκαθάριση", "λύση εταιρείας", otherwise false.
-- "property_type": The specific type of property (e.g., "Διαμέρισμα", "Οικόπεδο", "Αγροτεμάχιο", "Κατάστημα", "Μονοκατοικία"). Try to infer from descriptions even if not explicit. If not found, return "N/A".
-
-ADDITIONAL RULES:
-- For Greek numbers like "94.000,50", convert to float: 94000.5
-- Accept formats like "εμβαδόν 88,52 τ.μ.", "88,52 τ.μ.", "συνολική επιφάνεια 124,35"
-- If multiple areas are mentioned (e.g., 2 floors), sum them.
-- Normalize and clean address fields (remove extra line breaks, labels like "Οδός", etc.)
-- If auction is related to debt, mortgage, enforcement, extract that into "notes".
-
-Example output format:
-{
-  "property_area": 344.06,
-  "starting_price": 123000.0,
-  "address": "Παπαζαχαρίου 54, Λάρισα, Φιλιππούπολη",
-  "property_description": "Διαμέρισμα πρώτου ορόφου, κατάλληλο για κατοικία.",
-  "notes": "Υπάρχει υποθήκη υπέρ της Συνεταιριστικής Τράπεζας Θεσσαλίας.",
-  "occupancy_status": "Κατοικείται",
-  "is_bankruptcy": false,
-  "property_type": "Διαμέρισμα"
-}
+        data = parse_gemini_json(gemini_json_response)
+    except (json.JSONDecodeError, IndexError) as e:
+        print(f"Error parsing Gemini batch JSON: {e}")
+        return {}
+    if not isinstance(data, list):
+        print("Gemini batch JSON is not an array, ignoring")
+        return {}
+
+    analyses = {}
+    for entry in data:
+        if not isinstance(entry, dict):
+            continue
+        doc_id = str(entry.pop("auction_code", ""))
+        if doc_id in doc_ids and doc_id not in analyses:
+            analyses[doc_id] = entry
+    return analyses
+
+
+def build_scrape_summary_message(all_results):
+    """Format the Telegram message summarizing one batch of scraped results"""
+    num_results = len(all_results)
+
+    records = [item for item in all_results if isinstance(item, AuctionRecord)]
+
+    # Check for special keywords like 'Hot' or 'Opportunity'
+    hot_items = [record for record in records if "Hot" in record.ai_labels]
+
+    # Get opportunities that are not also "Hot" to avoid duplicates
+    opportunity_items = [
+        record for record in records
+        if record.simple_tag == "Opportunity" and "Hot" not in record.ai_labels
+    ]
 
-Document:
-"""
+    message = (
+        f"<b>Scraping Complete!</b>\n"
+        f"- Found: <b>{num_results}</b> results on this page."
+    )
 
-        # Send to Gemini
-        response = model.generate_content(prompt + "\n" + cleaned_text)
-        return response.text
-    except Exception as e:
-        print(f"Error calling Gemini API: {e}")
-        return None
+    if hot_items:
+        message += f"\n\n<b>🔥 Hot Items ({len(hot_items)}):</b>"
+        for item in hot_items:
+            prop_type = item.property_type or 'N/A'
+            address = item.address or 'N/A'
+            price = item.price or 'N/A'
+            area = item.property_area or 'N/A'
+            price_per_sqm = item.price_per_sqm
+            link = item.detail_link or '#'
+
+            message += (
+                f"\n--------------------------------------\n"
+                f"<b>{prop_type}</b> at {address}\n"
+                f"- Price: <b>{price}</b>\n"
+                f"- Area: {area} m²\n"
+                f"- Price per sq m: <b>{price_per_sqm}</b>\n"
+                f"- <a href=\"{link}\">View Details</a>"
+            )
+
+    if opportunity_items:
+        message += f"\n\n<b>💼 Other Opportunities ({len(opportunity_items)}):</b>"
+        for item in opportunity_items:
+            prop_type = item.property_type or 'N/A'
+            address = item.address or 'N/A'
+            price = item.price or 'N/A'
+            area = item.property_area or 'N/A'
+            price_per_sqm = item.price_per_sqm
+            link = item.detail_link or '#'
+
+            message += (
+                f"\n--------------------------------------\n"
+                f"<b>{prop_type}</b> at {address}\n"
+                f"- Price: <b>{price}</b>\n"
+                f"- Area: {area} m²\n"
+                f"- Price per sq m: <b>{price_per_sqm}</b>\n"
+                f"- <a href=\"{link}\">View Details</a>"
+            )
+
+    # Fallback message if no special items found
+    if not hot_items and not opportunity_items:
+        message += "\nNo special deals found in this batch."
+
+    return message
 
 
 def send_telegram_notification(message):
@@ -906,8 +612,9 @@ def send_telegram_notification(message):
     }
     
     try:
-        response = requests.post(url, data=payload)
-        response.raise_for_status()
+        with rate_controller.request_sync("telegram"):
+            response = get_session().post(url, data=payload, timeout=30)
+            response.raise_for_status()
         print("Telegram notification sent successfully.")
     except requests.exceptions.RequestException as e:
         print(f"Error sending Telegram notification: {e}")
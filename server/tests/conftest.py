@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+
+# The server modules import each other as top level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import AuctionRecord  # noqa: E402
+
+
+@pytest.fixture
+def make_record():
+    """Build an AuctionRecord from a few listing fields and a PDF analysis"""
+
+    def make(code="CODE1", price="40.000,00 €", conduct_date="20/10/2026", analysis=None,
+             pdf_href="https://www.eauction.gr/Auction/GetFile?id=1", **card):
+        card = {
+            "code": code,
+            "part_label": "Μέρος 1",
+            "post_date": "01/10/2026",
+            "status": "Ενεργή",
+            "price": price,
+            "conduct_date": conduct_date,
+            "debtor": "Debtor",
+            "kind": "Διαμέρισμα",
+            "region": "Αττική",
+            "municipality": "Αθηναίων",
+            "detail_link": f"https://www.eauction.gr/Auction/Details/{code}",
+            **card,
+        }
+        return AuctionRecord(card, pdf_href, [pdf_href] if pdf_href else [], analysis, None)
+
+    return make
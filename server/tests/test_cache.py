@@ -0,0 +1,75 @@
+import pytest
+from cache import AnalysisCache, PdfTextCache, content_hash
+
+URL = "https://www.eauction.gr/Auction/GetFile?id=1"
+
+
+@pytest.fixture
+def text_cache(tmp_path):
+    cache = PdfTextCache(str(tmp_path / "pdf_text.sqlite3"), max_bytes=10_000, ttl_seconds=3600)
+    yield cache
+    cache.close()
+
+
+def test_content_hash_of_text_and_bytes():
+    assert content_hash("Πτώχευση") == content_hash("Πτώχευση".encode("utf-8"))
+    assert len(content_hash(b"")) == 64
+
+
+def test_fresh_urls_are_served_without_downloading(text_cache):
+    text_cache.put(URL, "hash1", "page one\fpage two", [0, 9])
+    assert text_cache.get_fresh(URL) == ("page one\fpage two", [0, 9], True)
+    assert text_cache.get_fresh("https://www.eauction.gr/Auction/GetFile?id=2") is None
+
+
+def test_stale_urls_are_revalidated_by_hash(tmp_path):
+    cache = PdfTextCache(str(tmp_path / "pdf_text.sqlite3"), max_bytes=10_000, ttl_seconds=-1)
+    cache.put(URL, "hash1", "text")
+    assert cache.get_fresh(URL) is None
+    # The same document served under another URL reuses the stored text
+    other = "https://www.eauction.gr/Auction/GetFile?id=2"
+    assert cache.get_by_hash(other, "hash1") == ("text", [0], True)
+    assert cache.get_by_hash(other, "hash2") is None
+    cache.close()
+
+
+def test_budgeted_text_is_served_only_within_its_budget(text_cache):
+    text_cache.put(URL, "hash1", "cut text", [0], char_budget=1000)
+    assert text_cache.get_fresh(URL, char_budget=500) == ("cut text", [0], False)
+    assert text_cache.get_fresh(URL, char_budget=1000) == ("cut text", [0], False)
+    assert text_cache.get_fresh(URL, char_budget=2000) is None
+    assert text_cache.get_fresh(URL) is None
+    assert text_cache.get_by_hash(URL, "hash1") is None
+
+    # A whole document serves any budget
+    text_cache.put(URL, "hash1", "whole text", [0])
+    assert text_cache.get_by_hash(URL, "hash1", char_budget=2000) == ("whole text", [0], True)
+
+
+def test_least_recently_used_texts_are_evicted(tmp_path):
+    cache = PdfTextCache(str(tmp_path / "pdf_text.sqlite3"), max_bytes=25, ttl_seconds=3600)
+    for n in range(3):
+        cache.put(f"{URL}{n}", f"hash{n}", "x" * 10)
+    assert cache.get_fresh(f"{URL}0") is None
+    assert cache.get_by_hash(f"{URL}0", "hash0") is None
+    assert cache.get_fresh(f"{URL}1") is not None
+    assert cache.get_fresh(f"{URL}2") is not None
+    cache.close()
+
+
+def test_analyses_are_kept_per_prompt_version(tmp_path, capsys):
+    path = str(tmp_path / "analyses.sqlite3")
+    cache = AnalysisCache(path, "v1")
+    cache.put("hash1", {"address": "Οδός Αθηνάς 1", "property_area": 85.5})
+    assert cache.get("hash1") == {"address": "Οδός Αθηνάς 1", "property_area": 85.5}
+    assert cache.get("hash2") is None
+    cache.close()
+
+    # A new prompt version drops the analyses of older prompts
+    cache = AnalysisCache(path, "v2")
+    assert "Invalidated 1 cached analyses" in capsys.readouterr().out
+    assert cache.get("hash1") is None
+    cache.put("hash1", {"address": None})
+    assert cache.clear() == 1
+    assert cache.get("hash1") is None
+    cache.close()
@@ -0,0 +1,86 @@
+from datetime import datetime
+import pytest
+from labeling import (
+    LABEL_THRESHOLDS, THRESHOLD_SETTINGS, LabelColumns, label_items, preview_counts,
+    thresholds_with,
+)
+
+# The defaults, whatever the environment configures
+THRESHOLDS = {name: float(default) for name, (_, default) in THRESHOLD_SETTINGS.items()}
+NOW = datetime(2026, 10, 10).timestamp()
+
+
+@pytest.fixture
+def records(make_record):
+    return [
+        # 40.000 € / 100 m² = 400 €/m², 10 days before the auction
+        make_record(code="HOT", analysis={
+            "property_area": 100, "property_description": "Διαμέρισμα 2ου ορόφου",
+        }),
+        make_record(code="OPPORTUNITY", analysis={"property_area": 100}),
+        # 200.000 € / 100 m² = 2.000 €/m², in bankruptcy
+        make_record(code="EXPENSIVE", price="200.000,00 €", conduct_date="01/12/2026",
+                    analysis={"property_area": 100, "is_bankruptcy": True}),
+        make_record(code="NO_PDF", pdf_href=None),
+        make_record(code="RISKS", conduct_date="01/09/2026", analysis={
+            "property_area": 50, "notes": "Υπάρχει υποθήκη υπέρ τράπεζας",
+        }),
+    ]
+
+
+def labels(records):
+    return {record.code: (record.ai_labels, record.simple_tag) for record in records}
+
+
+def test_label_items(records):
+    assert labels(label_items(records, THRESHOLDS, NOW)) == {
+        "HOT": (("Καλή Ευκαιρία", "Hot"), "Opportunity"),
+        "OPPORTUNITY": (("Καλή Ευκαιρία",), "Opportunity"),
+        "EXPENSIVE": (("Πτώχευση", "Expensive"), "Expensive"),
+        "NO_PDF": (("Incomplete", "Προσοχή"), "Incomplete"),
+        "RISKS": (("Προσοχή",), "N/A"),
+    }
+
+
+def test_the_opportunity_window_counts_whole_days(records):
+    # The auction is exactly 10 days away, like (auction_date - now).days <= 10
+    thresholds = dict(THRESHOLDS, opportunity_days=10)
+    assert labels(label_items(records[1:2], thresholds, NOW))["OPPORTUNITY"][1] == "Opportunity"
+    thresholds["opportunity_days"] = 9
+    assert labels(label_items(records[1:2], thresholds, NOW))["OPPORTUNITY"][1] == "N/A"
+
+
+def test_missing_values_never_match_a_rule(make_record):
+    record = make_record(price=None, conduct_date=None, analysis={"property_area": 100})
+    columns = LabelColumns([record])
+    masks, simple_tags = columns.label(THRESHOLDS, NOW)
+    assert not any(mask[0] for mask in masks.values())
+    assert simple_tags.tolist() == ["N/A"]
+
+
+def test_label_items_without_records():
+    assert label_items([]) == []
+
+
+def test_counts_and_preview(records):
+    label_counts, tag_counts = LabelColumns(records).counts(THRESHOLDS, NOW)
+    assert label_counts["Καλή Ευκαιρία"] == 2
+    assert label_counts["Προσοχή"] == 2
+    assert tag_counts == {"N/A": 1, "Incomplete": 1, "Expensive": 1, "Opportunity": 2}
+
+    preview = preview_counts(records, dict(THRESHOLDS, expensive_price_per_sqm=300), NOW)
+    current = LabelColumns(records).counts(LABEL_THRESHOLDS, NOW)[0]["Expensive"]
+    assert preview["total"] == 5
+    assert preview["labels"]["Expensive"] == {
+        "current": current, "preview": 4, "change": 4 - current,
+    }
+
+
+def test_thresholds_with():
+    thresholds = thresholds_with({"caution_price": "60000"})
+    assert thresholds["caution_price"] == 60000.0
+    assert thresholds["opportunity_days"] == LABEL_THRESHOLDS["opportunity_days"]
+    with pytest.raises(ValueError, match="Unknown threshold"):
+        thresholds_with({"cheap": 1})
+    with pytest.raises(ValueError, match="Invalid caution_price"):
+        thresholds_with({"caution_price": "a lot"})
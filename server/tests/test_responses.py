@@ -0,0 +1,102 @@
+import gzip
+import json
+import pytest
+from flask import Flask
+import responses
+from responses import (
+    COMPRESS_MIN_BYTES, encode_json, json_response, requested_fields, requested_layout,
+    shape_results,
+)
+
+app = Flask(__name__)
+
+RESULTS = [
+    {"code": "A", "price": 10.0, "region": "Αττική"},
+    {"error": "Timeout", "code": "B"},
+    {"code": "C", "price": None},
+]
+
+
+def test_items_layout_projects_fields_and_keeps_errors_whole():
+    assert shape_results(RESULTS, ["code", "region"]) == [
+        {"code": "A", "region": "Αττική"},
+        {"error": "Timeout", "code": "B"},
+        {"code": "C"},
+    ]
+    assert shape_results(RESULTS) == RESULTS
+
+
+def test_columns_layout_writes_keys_once_and_lists_errors():
+    assert shape_results(RESULTS, ["code", "region"], "columns") == {
+        "columns": ["code", "region"],
+        "rows": [["A", "Αττική"], ["C", None]],
+        "errors": [{"index": 1, "error": "Timeout"}],
+    }
+    # Without fields every key found, in order of first appearance
+    assert shape_results(RESULTS, layout="columns")["columns"] == ["code", "price", "region"]
+
+
+def test_records_are_shaped_through_to_dict(make_record):
+    record = make_record(code="REC1")
+    assert shape_results([record], ["code", "detail_link"]) == [
+        {"code": "REC1", "detail_link": "https://www.eauction.gr/Auction/Details/REC1"}
+    ]
+
+
+@pytest.mark.parametrize("query, data, expected", [
+    ("", None, None),
+    ("?fields=code,+price,", None, ["code", "price"]),
+    ("", {"fields": "code,region"}, ["code", "region"]),
+    ("", {"fields": ["code", " price "]}, ["code", "price"]),
+    ("?fields=code", {"fields": ["price"]}, ["code"]),
+    ("", {"fields": []}, None),
+])
+def test_requested_fields(query, data, expected):
+    with app.test_request_context(f"/{query}"):
+        assert requested_fields(data) == expected
+
+
+@pytest.mark.parametrize("fields", [[1], {"code": True}, 5, ["code", None]])
+def test_requested_fields_rejects_other_types(fields):
+    with app.test_request_context("/"), pytest.raises(ValueError):
+        requested_fields({"fields": fields})
+
+
+def test_requested_layout():
+    with app.test_request_context("/"):
+        assert requested_layout() == "items"
+        assert requested_layout({"layout": "columns"}) == "columns"
+        with pytest.raises(ValueError, match="Unknown layout"):
+            requested_layout({"layout": "table"})
+    with app.test_request_context("/?layout=columns"):
+        assert requested_layout({"layout": "items"}) == "columns"
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_encode_json_is_compact_utf8(monkeypatch, make_record, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(responses, "orjson", None)
+    elif responses.orjson is None:
+        pytest.skip("orjson is not installed")
+    body = encode_json({"region": "Αττική", "items": [1, 2]})
+    assert body == '{"region":"Αττική","items":[1,2]}'.encode("utf-8")
+    record = make_record(code="REC1")
+    assert json.loads(encode_json([record])) == [record.to_dict()]
+
+
+def test_json_response_compresses_large_bodies_only(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    large = {"text": "x" * COMPRESS_MIN_BYTES}
+    with app.test_request_context("/", headers={"Accept-Encoding": "gzip"}):
+        response = json_response(large)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert json.loads(gzip.decompress(response.get_data())) == large
+
+        response = json_response({"text": "x"}, status=201)
+        assert "Content-Encoding" not in response.headers
+        assert response.status_code == 201
+    with app.test_request_context("/"):
+        response = json_response(large)
+        assert "Content-Encoding" not in response.headers
+        assert response.mimetype == "application/json"
@@ -0,0 +1,69 @@
+import pytest
+from results_store import InvalidQuery, ResultsStore, parse_query_date
+
+
+@pytest.fixture
+def store(tmp_path, make_record):
+    store = ResultsStore(str(tmp_path / "results.sqlite3"))
+    prices = [None, "30.000,00 €", "10.000,00 €", "20.000,00 €", "20.000,00 €", "50.000,00 €", None]
+    for n, price in enumerate(prices):
+        record = make_record(
+            code=f"CODE{n}",
+            price=price,
+            conduct_date=f"{10 + n}/10/2026",
+            region="Αττική" if n % 2 else "Κρήτη",
+            analysis={"property_area": 100.0},
+        )
+        record.ai_labels = ("Hot",) if n in (1, 2) else ()
+        store.save(record)
+    return store
+
+
+def pages(store, **query):
+    codes, cursor = [], None
+    while True:
+        items, cursor = store.query(cursor=cursor, **query)
+        codes.append([item["code"] for item in items])
+        if cursor is None:
+            return codes
+
+
+def test_keyset_pages_cover_every_row_once_with_nulls_last(store):
+    assert pages(store, sort="price", limit=2) == [
+        ["CODE2", "CODE3"], ["CODE4", "CODE1"], ["CODE5", "CODE0"], ["CODE6"],
+    ]
+
+
+def test_keyset_pages_descending(store):
+    codes = [code for page in pages(store, sort="price", descending=True, limit=3) for code in page]
+    assert codes == ["CODE5", "CODE1", "CODE4", "CODE3", "CODE2", "CODE6", "CODE0"]
+
+
+def test_filters_combine(store):
+    items, cursor = store.query({"region": "Αττική", "labels": ["Hot"]})
+    assert [item["code"] for item in items] == ["CODE1"]
+    assert cursor is None
+    items, _ = store.query({"date_from": "2026-10-12", "max_price": 20000})
+    assert [item["code"] for item in items] == ["CODE2", "CODE3", "CODE4"]
+
+
+def test_saving_again_replaces_the_row(store, make_record):
+    store.save(make_record(code="CODE2", price="99.000,00 €"))
+    items, _ = store.query({"code": "CODE2"})
+    assert [item["price"] for item in items] == ["99.000,00 €"]
+
+
+def test_cursor_of_another_sort_is_rejected(store):
+    _, cursor = store.query(sort="price", limit=1)
+    with pytest.raises(InvalidQuery):
+        store.query(sort="date", cursor=cursor)
+    with pytest.raises(InvalidQuery):
+        store.query(cursor="not a cursor")
+    with pytest.raises(InvalidQuery):
+        store.query(sort="area")
+
+
+def test_parse_query_date():
+    assert parse_query_date("20/10/2026") == "2026-10-20"
+    assert parse_query_date("2026-10-20") == "2026-10-20"
+    assert parse_query_date("20.10.2026") is None
@@ -0,0 +1,119 @@
+import pytest
+import rule_extractor
+from rule_extractor import (
+    RULE_FIELDS,
+    _occupancy,
+    extract_rule_fields,
+    fields_for_gemini,
+    settled_rule_fields,
+)
+from text_select import normalize
+
+
+@pytest.mark.parametrize(
+    "sentence, status",
+    [
+        ("Το ακίνητο κατοικείται από τον οφειλέτη.", "Κατοικείται"),
+        ("Υπάρχει μισθωτήριο συμβόλαιο με ενοικιαστή.", "Κατοικείται"),
+        ("Το ακίνητο δεν κατοικείται.", "Ακατοίκητο"),
+        ("Δεν υπάρχουν ένοικοι στο ακίνητο.", "Ακατοίκητο"),
+        ("Το ακίνητο είναι ακατοίκητο.", "Ακατοίκητο"),
+        ("Μη κατοικούμενο διαμέρισμα.", "Ακατοίκητο"),
+        ("Το ακίνητο εκκενώθηκε.", "Εκκενωμένο"),
+    ],
+)
+def test_occupancy_settles(sentence, status):
+    assert _occupancy(normalize(sentence)) == (status, 0.9)
+
+
+@pytest.mark.parametrize(
+    "sentence",
+    [
+        "Το ακίνητο δεν είναι εκκενωμένο.",
+        "Δεν είναι γνωστό αν κατοικείται.",
+    ],
+)
+def test_occupancy_left_to_gemini(sentence):
+    _, confidence = _occupancy(normalize(sentence))
+    assert confidence < 0.8
+
+
+def test_occupancy_conflicting_terms_are_unsure():
+    text = normalize("Το ισόγειο δεν κατοικείται. Στον πρώτο όροφο διαμένει ο οφειλέτης.")
+    assert _occupancy(text)[1] < 0.8
+
+
+def test_missing_terms_settle_a_complete_document():
+    fields = extract_rule_fields("Διαμέρισμα πρώτου ορόφου, εμβαδόν 88,52 τ.μ.")
+    assert fields["is_bankruptcy"] == (False, 0.85)
+    assert fields["occupancy_status"] == ("N/A", 0.85)
+
+
+def test_missing_terms_do_not_settle_a_truncated_document():
+    fields = extract_rule_fields("Διαμέρισμα πρώτου ορόφου, εμβαδόν 88,52 τ.μ.", complete=False)
+    assert fields["is_bankruptcy"][1] < 0.8
+    assert fields["occupancy_status"][1] < 0.8
+
+
+def test_bankruptcy_term_settles_true():
+    assert extract_rule_fields("Η εταιρεία τελεί υπό εκκαθάριση.")["is_bankruptcy"] == (True, 0.9)
+
+
+def test_inconclusive_occupancy_term_does_not_settle_na():
+    assert _occupancy(normalize("Το ακίνητο δεν είναι εκκενωμένο.")) == ("N/A", 0.3)
+
+
+def test_gemini_fields_follow_settled_fields(monkeypatch):
+    monkeypatch.setattr(rule_extractor, "GEMINI_REQUIRED_FIELDS", ())
+    assert fields_for_gemini(dict.fromkeys(RULE_FIELDS)) == ()
+    assert fields_for_gemini({"property_area": 88.52}) == (
+        "starting_price", "occupancy_status", "is_bankruptcy", "property_type",
+    )
+    monkeypatch.setattr(rule_extractor, "GEMINI_REQUIRED_FIELDS", ("notes",))
+    assert fields_for_gemini(dict.fromkeys(RULE_FIELDS)) == ("notes",)
+
+
+@pytest.mark.parametrize(
+    "sentence, area, confidence",
+    [
+        ("Διαμέρισμα εμβαδού 88,52 τ.μ. στον πρώτο όροφο.", 88.52, 0.9),
+        ("Συνολική επιφάνεια 1.124,35 τ.μ.", 1124.35, 0.9),
+        ("Κατάστημα 64 τ.μ. στο ισόγειο.", 64.0, 0.8),
+        ("Ισόγειο εμβαδού 50 τ.μ. και όροφος εμβαδού 70 τ.μ.", 50.0, 0.4),
+        ("Διαμέρισμα στον πρώτο όροφο.", None, 0.0),
+    ],
+)
+def test_area(sentence, area, confidence):
+    assert extract_rule_fields(sentence)["property_area"] == (area, confidence)
+
+
+def test_starting_price_from_the_document_agrees_with_the_listing():
+    text = "Τιμή πρώτης προσφοράς: 94.000,50 ευρώ."
+    assert extract_rule_fields(text, "94.000,50 €")["starting_price"] == (94000.5, 0.95)
+    assert extract_rule_fields(text)["starting_price"] == (94000.5, 0.85)
+    assert extract_rule_fields(text, "80.000,00 €")["starting_price"] == (94000.5, 0.5)
+
+
+def test_starting_price_falls_back_to_the_listing():
+    assert extract_rule_fields("Διαμέρισμα.", "40.000,00 €")["starting_price"] == (40000.0, 0.85)
+    assert extract_rule_fields("Διαμέρισμα.")["starting_price"] == (None, 0.0)
+
+
+def test_property_type():
+    text = "Διαμέρισμα με αποθήκη και θέση στάθμευσης. Το διαμέρισμα είναι ανακαινισμένο."
+    assert extract_rule_fields(text)["property_type"] == ("Διαμέρισμα", 0.85)
+    assert extract_rule_fields("Οικόπεδο με κατάστημα.")["property_type"] == ("Οικόπεδο", 0.5)
+    assert extract_rule_fields("Ακίνητο.")["property_type"] == ("N/A", 0.3)
+
+
+def test_settled_fields_meet_the_threshold(monkeypatch):
+    text = "Διαμέρισμα εμβαδού 88,52 τ.μ. Το ακίνητο δεν κατοικείται."
+    assert settled_rule_fields(text, "40.000,00 €") == {
+        "occupancy_status": "Ακατοίκητο",
+        "is_bankruptcy": False,
+        "property_area": 88.52,
+        "starting_price": 40000.0,
+        "property_type": "Διαμέρισμα",
+    }
+    monkeypatch.setattr(rule_extractor, "RULES_ENABLED", False)
+    assert settled_rule_fields(text, "40.000,00 €") == {}
@@ -0,0 +1,40 @@
+from text_select import GAP_MARKER, HEAD_CHARS, normalize, score_line, select_relevant_text
+
+
+def test_normalize_drops_accents_and_final_sigma():
+    assert normalize("Εμβαδόν ΟΙΚΌΠΕΔΟΣ") == "εμβαδον οικοπεδοσ"
+
+
+def test_score_line_adds_term_weights():
+    assert score_line("Διαμέρισμα εμβαδού 88 τ.μ.") == 4 + 1
+    assert score_line("Κάτι άσχετο") == 0
+
+
+def test_short_documents_are_returned_whole():
+    lines = ["Πρώτη γραμμή", "Δεύτερη γραμμή"]
+    assert select_relevant_text(lines, 1000) == "Πρώτη γραμμή\nΔεύτερη γραμμή"
+
+
+def test_long_documents_keep_the_head_and_windows_around_relevant_lines():
+    filler = [f"Γραμμή κειμένου αριθμός {n} χωρίς ενδιαφέρον για την ανάλυση." for n in range(400)]
+    lines = filler[:200] + ["Το ακίνητο έχει εμβαδόν 88,52 τ.μ."] + filler[200:]
+    text = select_relevant_text(lines, 2500)
+
+    assert len(text) <= 2500 + 2 * len(GAP_MARKER) + 2
+    kept = text.split("\n")
+    head = kept[: kept.index(GAP_MARKER)]
+    assert head == lines[: len(head)]
+    assert len("\n".join(head)) >= HEAD_CHARS - len(lines[0])
+    area = kept.index(lines[200])
+    # Two lines either side of the match, in document order, between gaps
+    assert kept[area - 3: area + 4] == [GAP_MARKER] + lines[198:203] + [GAP_MARKER]
+
+
+def test_documents_without_relevant_lines_are_cut():
+    lines = ["Κάτι άσχετο"] * 100
+    assert select_relevant_text(lines, 50) == "\n".join(lines)[:50]
+
+
+def test_lines_longer_than_the_budget_are_cut():
+    lines = ["εμβαδόν " + "x" * 200, "τ.μ. " + "y" * 200]
+    assert select_relevant_text(lines, 100) == "\n".join(lines)[:100]
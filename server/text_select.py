@@ -0,0 +1,90 @@
+import re
+import unicodedata
+
+# Terms the analysis looks for, as patterns on normalize() output, with the
+# weight a line matching them gets. Area lines weigh most: a missing area is
+# what makes an auction "Incomplete".
+RELEVANCE_TERMS = (
+    ("area", 4, re.compile(r"τ\.?\s?μ\b|τετραγωνικ|εμβαδ|επιφανει|m2|μ2|m²|μ²")),
+    ("address", 2, re.compile(r"\bοδο[συ]?\b|\bοδ\.|διευθυνσ|\bαρ\.\s?\d|ταχ\.?\s?κωδ")),
+    ("encumbrance", 2, re.compile(r"υποθηκ|προσημειωσ|βαρη|βαροσ|κατασχεσ|δουλει|διεκδικ")),
+    ("occupancy", 2, re.compile(r"κατοικειται|κατοικητ|ενοικ|μισθωτ|διαμεν|εκκενω")),
+    ("price", 2, re.compile(r"πρωτησ\s+προσφορασ|τιμη\s+εκκινησ")),
+    ("bankruptcy", 1, re.compile(r"πτωχευ|εκκαθαρισ|ειδικ\w*\s+διαχειρισ")),
+    ("property", 1, re.compile(r"διαμερισμα|μεζονετα|κατοικια|καταστημα|οικοπεδ|αγροτεμαχ|οροφο")),
+)
+# Lines kept around every relevant line, and characters always kept from the
+# start of a document (court, debtor and a first description of the property)
+WINDOW_LINES = 2
+HEAD_CHARS = 1500
+GAP_MARKER = "[...]"
+
+
+def normalize(text):
+    """Lower case Greek text without accents, with every sigma as σ"""
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).replace("ς", "σ")
+
+
+def score_line(line):
+    """Sum of the weights of the relevance terms a line mentions"""
+    folded = normalize(line)
+    return sum(weight for _, weight, pattern in RELEVANCE_TERMS if pattern.search(folded))
+
+
+def select_relevant_text(lines, max_chars):
+    """Pick the lines of a document worth sending to the analysis.
+
+    lines are non-blank, stripped lines. Documents within max_chars are
+    returned whole. Longer ones keep their first HEAD_CHARS characters, then
+    windows of WINDOW_LINES lines around the highest scoring lines until
+    max_chars is reached, and a document without any relevant line is cut
+    at max_chars. Lines stay in document order, and GAP_MARKER
+    stands for every run of skipped lines.
+    """
+    text = "\n".join(lines)
+    if len(text) <= max_chars:
+        return text
+    scores = [score_line(line) for line in lines]
+    if not any(scores):
+        # Nothing recognizable (e.g. a badly scanned document): the beginning
+        return text[:max_chars]
+
+    keep = set()
+    used = 0
+
+    def add(index):
+        nonlocal used
+        cost = len(lines[index]) + 1
+        if index in keep or used + cost > max_chars:
+            return False
+        keep.add(index)
+        used += cost
+        return True
+
+    for index in range(len(lines)):
+        if used >= HEAD_CHARS or not add(index):
+            break
+
+    ranked = sorted((-score, index) for index, score in enumerate(scores) if score)
+    for _, index in ranked:
+        if used >= max_chars:
+            break
+        # The matching line first, then its neighbours nearest first
+        for offset in [0] + [d for step in range(1, WINDOW_LINES + 1) for d in (-step, step)]:
+            if 0 <= index + offset < len(lines):
+                add(index + offset)
+    if not keep:
+        # Lines longer than the whole budget
+        return text[:max_chars]
+
+    selected = []
+    previous = -1
+    for index in sorted(keep):
+        if index != previous + 1:
+            selected.append(GAP_MARKER)
+        selected.append(lines[index])
+        previous = index
+    if previous != len(lines) - 1:
+        selected.append(GAP_MARKER)
+    return "\n".join(selected)